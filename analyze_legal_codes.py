@@ -1,17 +1,14 @@
 import os
+import sys
 import glob
+import time
 import numpy as np
-import pandas as pd
-from sentence_transformers import SentenceTransformer
-from sklearn.cluster import DBSCAN
-import plotly.express as px
-import plotly.graph_objects as go
-from umap import UMAP
-import json
 
-def load_legal_texts():
-    """Load all corrected legal texts from the results directories."""
-    texts = []
+# Embedding, clustering, UMAP and plotting modules are imported where they are
+# used, so finding no texts (or importing find_legal_files) stays fast
+
+def find_legal_files(pattern="*_corrected.txt"):
+    """List metadata (file, state, path) for result files matching pattern."""
     metadata = []
     
     # Define the base directory and state folders
@@ -23,50 +20,96 @@ def load_legal_texts():
         if not os.path.exists(dir_path):
             continue
             
-        # Find all corrected text files
-        files = glob.glob(os.path.join(dir_path, "*_corrected.txt"))
-        
-        for file_path in files:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    
-                # Extract metadata from filename
-                filename = os.path.basename(file_path)
-                state = state_dir.split('_')[0].upper()
+        for file_path in glob.glob(os.path.join(dir_path, pattern)):
+            # Extract metadata from filename
+            metadata.append({
+                'file': os.path.basename(file_path),
+                'state': state_dir.split('_')[0].upper(),
+                'path': file_path
+            })
+    
+    return metadata
+
+def load_legal_texts():
+    """Load all corrected legal texts from the results directories."""
+    texts = []
+    metadata = []
+    
+    for entry in find_legal_files("*_corrected.txt"):
+        file_path = entry['path']
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
                 
-                texts.append(content)
-                metadata.append({
-                    'file': filename,
-                    'state': state,
-                    'path': file_path
-                })
-            except Exception as e:
-                print(f"Error reading {file_path}: {str(e)}")
+            texts.append(content)
+            metadata.append(entry)
+        except Exception as e:
+            print(f"Error reading {file_path}: {str(e)}")
     
     return texts, metadata
 
-def process_texts(texts):
-    """Process texts using sentence transformers."""
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-    embeddings = model.encode(texts, show_progress_bar=True)
-    return embeddings
+def process_texts(texts, store=None, keep_chunks=False):
+    """Embed texts using sentence transformers.
+
+    Embeddings are kept in an EmbeddingStore keyed by content hash, so only new
+    or changed documents are encoded; the rest are read from the memory map.
+    Long documents are embedded as overlapping windows pooled into one vector
+    rather than being truncated at the model's token limit.
+    """
+    from embedding_store import EmbeddingStore
+    store = store or EmbeddingStore("ocr_ai_results", 'all-MiniLM-L6-v2', keep_chunks=keep_chunks)
+    encoded = store.add(texts, show_progress_bar=True)
+    print(f"Encoded {encoded} new or changed documents, loaded the rest from the embedding store")
+    if encoded:
+        stats = store.last_stats
+        print(f"Embedded {stats['windows']} windows ({stats['tokens']:,} tokens) in {stats['seconds']:.1f}s, "
+              f"{stats['tokens_per_second']:,.0f} tokens/s")
+    return store.embed(texts)
 
-def cluster_documents(embeddings):
-    """Cluster documents using DBSCAN."""
+def cluster_documents(embeddings, graph=None, eps=0.5, min_samples=2):
+    """Cluster documents using DBSCAN over a cosine k-nearest-neighbour graph.
+
+    The graph keeps memory linear in the number of documents, unlike
+    DBSCAN(metric='cosine'), which computes all pairwise distances. Pass a
+    graph from build_neighbor_graph to reuse it.
+    """
+    from clustering import build_neighbor_graph, cluster_graph
+    if graph is None:
+        graph = build_neighbor_graph(embeddings)
     # Using a larger eps value and smaller min_samples for more inclusive clustering
-    clusterer = DBSCAN(eps=0.5, min_samples=2, metric='cosine')
-    clusters = clusterer.fit_predict(embeddings)
+    clusters = cluster_graph(graph, eps=eps, min_samples=min_samples)
     return clusters
 
-def reduce_dimensions(embeddings):
-    """Reduce dimensions using UMAP for visualization."""
-    reducer = UMAP(n_components=2, random_state=42)
-    reduced_embeddings = reducer.fit_transform(embeddings)
+def reduce_dimensions(embeddings, hashes, refit=False, drift_threshold=0.2):
+    """Reduce dimensions using UMAP for visualization.
+
+    The fitted reducer and coordinates are cached by document content hash, so
+    existing documents keep their positions and new ones are placed with
+    transform; see ProjectionCache for when it refits.
+    """
+    from projection import ProjectionCache
+    projection = ProjectionCache("ocr_ai_results", 'all-MiniLM-L6-v2', drift_threshold=drift_threshold)
+    reduced_embeddings = projection.project(hashes, embeddings, refit=refit)
     return reduced_embeddings
 
-def create_visualizations(reduced_embeddings, clusters, metadata):
-    """Create interactive visualizations using plotly."""
+def create_visualizations(reduced_embeddings, clusters, metadata, mode='webgl', max_points=None,
+                          include_plotlyjs=True):
+    """Create interactive visualizations using plotly.
+
+    'webgl' writes a single visualizations.html with WebGL traces, a
+    density-sampled overview and per-cluster drill-down; 'svg' writes the
+    original two px.scatter pages. max_points defaults to
+    visualize.DEFAULT_MAX_POINTS. Returns {path: (write seconds, bytes)}.
+    """
+    if mode == 'webgl':
+        from visualize import write_webgl_visualization, DEFAULT_MAX_POINTS
+        max_points = max_points or DEFAULT_MAX_POINTS
+        path = "visualizations.html"
+        return {path: write_webgl_visualization(reduced_embeddings, clusters, metadata, path,
+                                                max_points, include_plotlyjs)}
+
+    import pandas as pd
+    import plotly.express as px
     df = pd.DataFrame({
         'UMAP1': reduced_embeddings[:, 0],
         'UMAP2': reduced_embeddings[:, 1],
@@ -96,20 +139,32 @@ def create_visualizations(reduced_embeddings, clusters, metadata):
     )
     
     # Save the visualizations
-    fig_clusters.write_html("visualizations_clusters.html")
-    fig_states.write_html("visualizations_states.html")
-    
-    # Save the clustering results
-    results = {
-        'clusters': clusters.tolist(),
-        'metadata': metadata,
-        'coordinates': reduced_embeddings.tolist()
+    written = {}
+    for path, fig in (("visualizations_clusters.html", fig_clusters), ("visualizations_states.html", fig_states)):
+        start = time.perf_counter()
+        fig.write_html(path, include_plotlyjs=include_plotlyjs)
+        written[path] = (time.perf_counter() - start, os.path.getsize(path))
+    return written
+
+def save_results(reduced_embeddings, clusters, metadata, embeddings=None, export_json=False):
+    """Save the clustering results as a columnar bundle (one memory-mappable .npy per column)."""
+    from results_bundle import write_results, ResultsBundle
+    columns = {
+        'cluster': np.asarray(clusters, dtype=np.int32),
+        'coordinates': np.asarray(reduced_embeddings, dtype=np.float32),
+        'file': [m['file'] for m in metadata],
+        'state': [m['state'] for m in metadata],
+        'path': [m['path'] for m in metadata]
     }
+    if embeddings is not None:
+        columns['embedding'] = np.asarray(embeddings, dtype=np.float32)
+    write_results("clustering_results", columns)
     
-    with open('clustering_results.json', 'w') as f:
-        json.dump(results, f, indent=2)
+    if export_json:
+        ResultsBundle("clustering_results").export_json('clustering_results.json')
 
-def main():
+def run(args):
+    """The `analyze` command; args are parsed by legal_codes.cli"""
     print("Loading legal texts...")
     texts, metadata = load_legal_texts()
     
@@ -117,21 +172,40 @@ def main():
         print("No legal texts found!")
         return
     
+    from clustering import build_neighbor_graph, sweep, print_sweep
+    from embedding_store import content_hash
+
     print(f"Processing {len(texts)} documents...")
-    embeddings = process_texts(texts)
+    embeddings = process_texts(texts, keep_chunks=args.keep_chunks)
     
+    # Neighbours are found once; the sweep and the final clustering both reuse the graph
+    n_neighbors = max([30, args.min_samples] + (args.min_samples_grid if args.sweep else []))
+    graph = build_neighbor_graph(embeddings, n_neighbors=n_neighbors)
+
+    if args.sweep:
+        print("Sweeping clustering settings...")
+        print_sweep(sweep(graph, args.eps_grid, args.min_samples_grid, args.min_cluster_sizes))
+        return
+
     print("Clustering documents...")
-    clusters = cluster_documents(embeddings)
+    clusters = cluster_documents(embeddings, graph, eps=args.eps, min_samples=args.min_samples)
     
     print("Reducing dimensions for visualization...")
-    reduced_embeddings = reduce_dimensions(embeddings)
+    hashes = [content_hash(text) for text in texts]
+    reduced_embeddings = reduce_dimensions(embeddings, hashes, refit=args.refit_umap,
+                                           drift_threshold=args.drift_threshold)
     
     print("Creating visualizations...")
-    create_visualizations(reduced_embeddings, clusters, metadata)
+    written = create_visualizations(reduced_embeddings, clusters, metadata, mode=args.viz,
+                                    max_points=args.max_points,
+                                    include_plotlyjs='cdn' if args.plotlyjs_cdn else True)
+    save_results(reduced_embeddings, clusters, metadata,
+                 embeddings if args.save_embeddings else None, export_json=args.json)
     
     print("\nAnalysis complete!")
-    print("- Visualizations saved as 'visualizations_clusters.html' and 'visualizations_states.html'")
-    print("- Results saved in 'clustering_results.json'")
+    for path, (seconds, size) in written.items():
+        print(f"- Visualization saved as '{path}' ({size / 1024 / 1024:.1f} MB, written in {seconds:.2f}s)")
+    print("- Results saved in 'clustering_results/'" + (" and 'clustering_results.json'" if args.json else ""))
     
     # Print cluster statistics
     unique_clusters = np.unique(clusters)
@@ -144,5 +218,9 @@ def main():
         count = np.sum(clusters == cluster)
         print(f"{label}: {count} documents")
 
+def main():
+    from legal_codes.cli import main as cli_main
+    cli_main(['analyze', *sys.argv[1:]])
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,411 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import resource
+import tempfile
+import textwrap
+import threading
+import subprocess
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Pages per synthetic corpus
+SIZES = {'small': 10, 'medium': 50, 'large': 200}
+STAGES = ['convert', 'ocr', 'correct', 'analyze']
+RESULTS_DIR = "benchmark_results"
+
+WORDS = (
+    "the court shall grant divorce upon petition of either party when it appears that "
+    "husband wife marriage alimony custody minor children property support maintenance "
+    "decree separation bed board abandonment cruelty adultery residence county state "
+    "section chapter act provided further notwithstanding pursuant thereof hereby judge "
+    "clerk filing notice service complaint answer hearing evidence testimony witness"
+).split()
+
+# Common OCR confusions applied to the page text to give the correction stage realistic input
+OCR_CONFUSIONS = [('s', 'f'), ('rn', 'm'), ('l', '1'), ('e', 'c'), ('h', 'b')]
+
+
+def synthetic_text(rng, paragraphs=4, words_per_paragraph=70):
+    """A page of legal-sounding prose with numbered sections"""
+    result = []
+    for i in range(paragraphs):
+        words = [rng.choice(WORDS) for _ in range(words_per_paragraph)]
+        words[0] = words[0].capitalize()
+        result.append(f"Sec. {rng.randint(1, 999)}-{i + 1}. " + " ".join(words) + ".")
+    return "\n\n".join(result)
+
+
+def add_ocr_noise(text, rng, rate=0.03):
+    """Text with roughly `rate` of its words hit by a typical OCR confusion"""
+    words = text.split(" ")
+    for i, word in enumerate(words):
+        if rng.random() < rate:
+            source, target = rng.choice([c for c in OCR_CONFUSIONS if c[0] in word] or [('', '')])
+            if source:
+                words[i] = word.replace(source, target, 1)
+    return " ".join(words)
+
+
+def load_font(size):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def render_text_page(text, width=1700, height=2200, font_size=30, margin=120):
+    """Draw text onto a white letter-size page (200 dpi) the way a clean scan would look"""
+    image = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    font = load_font(font_size)
+    y = margin
+    for paragraph in text.split("\n\n"):
+        for line in textwrap.wrap(paragraph, width=int((width - 2 * margin) / (font_size * 0.55))):
+            draw.text((margin, y), line, fill=0, font=font)
+            y += int(font_size * 1.4)
+        y += font_size
+    return image
+
+
+def make_corpus(directory, pages, seed=42, pages_per_pdf=10):
+    """Write a synthetic corpus of known text under directory.
+
+    Creates pages/page_NNNN.png with matching .txt ground truth, and the same
+    pages bundled into image-only multi-page PDFs under al_divorce_codes/ (the
+    layout convert_pdfs.py expects). Returns a list of page dicts.
+    """
+    rng = random.Random(seed)
+    page_dir = os.path.join(directory, "pages")
+    pdf_dir = os.path.join(directory, "al_divorce_codes")
+    os.makedirs(page_dir, exist_ok=True)
+    os.makedirs(pdf_dir, exist_ok=True)
+
+    corpus = []
+    images = []
+    for number in range(1, pages + 1):
+        text = synthetic_text(rng)
+        image = render_text_page(text)
+        image_path = os.path.join(page_dir, f"page_{number:04d}.png")
+        image.save(image_path)
+        with open(os.path.splitext(image_path)[0] + ".txt", 'w', encoding='utf-8') as f:
+            f.write(text)
+        corpus.append({'image': image_path, 'text': text, 'noisy_text': add_ocr_noise(text, rng)})
+        images.append(image)
+
+        if len(images) == pages_per_pdf or number == pages:
+            pdf_path = os.path.join(pdf_dir, f"bench_{(number - 1) // pages_per_pdf + 1:03d}.pdf")
+            images[0].save(pdf_path, save_all=True, append_images=images[1:], resolution=200)
+            images = []
+    return corpus
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else None
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and of its (waited-for) children, in MB"""
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale)
+
+
+def summarize(pages, seconds, latencies, errors=None, **extra):
+    """Per-stage metrics: throughput, latency percentiles (ms), CER and peak memory"""
+    self_rss, children_rss = peak_rss_mb()
+    summary = {
+        'pages': pages,
+        'seconds': round(seconds, 3),
+        'pages_per_sec': round(pages / seconds, 2) if seconds else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        'cer': round(float(np.mean(errors)), 4) if errors else None,
+        'peak_rss_mb': round(self_rss, 1),
+        'workers_peak_rss_mb': round(children_rss, 1),
+    }
+    summary.update(extra)
+    return summary
+
+
+def character_error_rate(reference, hypothesis):
+    from preprocess import character_accuracy
+    return 1.0 - character_accuracy(reference, hypothesis)
+
+
+def stage_convert(workspace, corpus, dpi=200):
+    """convert_pdfs.convert_pdf_to_jpg over the synthetic PDFs; latency is per page"""
+    if shutil.which('pdftoppm') is None:
+        raise RuntimeError("poppler (pdftoppm) is not installed")
+    from convert_pdfs import convert_pdf_to_jpg
+    from pdf2image import pdfinfo_from_path
+
+    # convert_pdf_to_jpg takes the state code from the first component of a relative path
+    os.chdir(workspace)
+    output_dir = "divorce_codes_jpg"
+    os.makedirs(os.path.join(output_dir, "al_divorce_codes_jpg"), exist_ok=True)
+    latencies = []
+    pages = 0
+    start = time.perf_counter()
+    for pdf_name in sorted(os.listdir("al_divorce_codes")):
+        pdf_path = os.path.join("al_divorce_codes", pdf_name)
+        page_count = pdfinfo_from_path(pdf_path)['Pages']
+        pdf_start = time.perf_counter()
+        convert_pdf_to_jpg(pdf_path, output_dir, dpi=dpi)
+        latencies += [(time.perf_counter() - pdf_start) / page_count] * page_count
+        pages += page_count
+    seconds = time.perf_counter() - start
+
+    written = len(os.listdir(os.path.join(output_dir, "al_divorce_codes_jpg")))
+    if written < pages:
+        raise RuntimeError(f"only {written} of {pages} pages were converted")
+    return summarize(pages, seconds, latencies)
+
+
+def timed_ocr(image_path, preprocess=None):
+    from process_ocr_ai_with_resume import run_tesseract
+    start = time.perf_counter()
+    text = run_tesseract(image_path, preprocess)['text']
+    return text, time.perf_counter() - start
+
+
+def stage_ocr(workspace, corpus, workers=2, backend='auto', preprocess=None):
+    """run_tesseract over the page images in a worker pool, scored against the known text"""
+    from process_ocr_ai_with_resume import init_ocr_worker
+    # OCR one page here first: a missing engine then fails (and skips the stage) with a
+    # readable error, rather than as an exception the worker pool can't unpickle
+    init_ocr_worker(backend)
+    timed_ocr(corpus[0]['image'], preprocess)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_ocr_worker, initargs=(backend,)) as executor:
+        futures = [executor.submit(timed_ocr, page['image'], preprocess) for page in corpus]
+        results = [future.result() for future in futures]
+    seconds = time.perf_counter() - start
+
+    errors = [character_error_rate(page['text'], text) for page, (text, _) in zip(corpus, results)]
+    return summarize(len(corpus), seconds, [latency for _, latency in results], errors, workers=workers)
+
+
+def stage_correct(workspace, corpus, latency=0.2, error_rate=0.05, retry_after=1, concurrency=8):
+    """CorrectionEngine against a local mock endpoint, fed the pages with OCR-style noise.
+
+    The mock echoes its input, so 'cer' equals 'input_cer' here; against a real
+    endpoint the difference is what correction buys.
+    """
+    from mock_openai_server import create_server
+    from correction_engine import CorrectionEngine
+
+    server = create_server(port=0, latency=latency, error_rate=error_rate, retry_after=retry_after)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    async def run():
+        engine = CorrectionEngine(api_key="benchmark", base_url=base_url, max_concurrency=concurrency,
+                                  requests_per_minute=1000000, tokens_per_minute=100000000, base_delay=0.1)
+
+        async def correct(text):
+            page_start = time.perf_counter()
+            result = await engine.correct(text)
+            return result, time.perf_counter() - page_start
+
+        try:
+            return await asyncio.gather(*[correct(page['noisy_text']) for page in corpus])
+        finally:
+            await engine.close()
+
+    try:
+        start = time.perf_counter()
+        results = asyncio.run(run())
+        seconds = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    errors = [character_error_rate(page['text'], result['text']) for page, (result, _) in zip(corpus, results)]
+    input_errors = [character_error_rate(page['text'], page['noisy_text']) for page in corpus]
+    return summarize(len(corpus), seconds, [page_seconds for _, page_seconds in results], errors,
+                     input_cer=round(float(np.mean(input_errors)), 4),
+                     retries=sum(result.get('retries', 0) for result, _ in results),
+                     latency_setting=latency, error_rate_setting=error_rate)
+
+
+def stage_analyze(workspace, corpus, documents_per_page=20, n_neighbors=30, eps=0.5, min_samples=2):
+    """Graph clustering plus the WebGL visualization on synthetic embeddings.
+
+    Embedding and UMAP need models that are too slow to benchmark here, so the
+    stage starts from synthetic_embeddings and uses the first two dimensions as
+    coordinates. Throughput is reported per document.
+    """
+    from clustering import synthetic_embeddings, build_neighbor_graph, cluster_graph
+    from visualize import write_webgl_visualization
+
+    count = len(corpus) * documents_per_page
+    embeddings = synthetic_embeddings(count)
+    metadata = [{'file': f"doc_{i}.txt", 'state': ('AL', 'NC', 'TN')[i % 3]} for i in range(count)]
+    timings = {}
+
+    start = time.perf_counter()
+    step = time.perf_counter()
+    graph = build_neighbor_graph(embeddings, n_neighbors)
+    timings['graph_seconds'] = round(time.perf_counter() - step, 3)
+    step = time.perf_counter()
+    labels = cluster_graph(graph, eps, min_samples)
+    timings['cluster_seconds'] = round(time.perf_counter() - step, 3)
+    _, html_bytes = write_webgl_visualization(embeddings[:, :2], labels, metadata,
+                                              os.path.join(workspace, "visualizations.html"),
+                                              include_plotlyjs='cdn')
+    seconds = time.perf_counter() - start
+    return summarize(count, seconds, [], clusters=len(set(labels.tolist()) - {-1}),
+                     html_bytes=html_bytes, **timings)
+
+
+STAGE_FUNCTIONS = {
+    'convert': stage_convert,
+    'ocr': stage_ocr,
+    'correct': stage_correct,
+    'analyze': stage_analyze,
+}
+
+
+def stage_or_skip(name, workspace, corpus, options):
+    """Run a stage, reporting it as skipped with the reason if it fails (e.g. no poppler or Tesseract).
+
+    The error is turned into text here because some (TesseractNotFoundError)
+    can't be pickled back to the parent process.
+    """
+    try:
+        return STAGE_FUNCTIONS[name](workspace, corpus, **options)
+    except Exception as e:
+        return {'skipped': f"{type(e).__name__}: {e}"}
+
+
+def run_stage(name, workspace, corpus, options):
+    """Run one stage in a fresh process so its peak RSS is its own"""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(stage_or_skip, name, workspace, corpus, options).result()
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    print(f"\n{'size':<8} {'stage':<8} {'pages':>6} {'pages/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'CER':>6} {'RSS MB':>7}")
+    for size, stages in results['runs'].items():
+        for stage, metrics in stages.items():
+            if 'skipped' in metrics:
+                print(f"{size:<8} {stage:<8} skipped: {metrics['skipped']}")
+                continue
+            cer = f"{metrics['cer']:.3f}" if metrics['cer'] is not None else "-"
+            p50 = f"{metrics['p50_ms']:.1f}" if metrics['p50_ms'] is not None else "-"
+            p95 = f"{metrics['p95_ms']:.1f}" if metrics['p95_ms'] is not None else "-"
+            rss = metrics['peak_rss_mb'] + metrics['workers_peak_rss_mb']
+            print(f"{size:<8} {stage:<8} {metrics['pages']:>6} {metrics['pages_per_sec']:>8.1f} {p50:>8} {p95:>8} "
+                  f"{cer:>6} {rss:>7.0f}")
+
+
+def compare(baseline_path, candidate_path):
+    """Print the change in throughput, p95 latency, CER and memory between two result files"""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+    with open(candidate_path, 'r') as f:
+        candidate = json.load(f)
+    print(f"{baseline_path} ({baseline.get('revision')}) -> {candidate_path} ({candidate.get('revision')})")
+    print(f"{'size':<8} {'stage':<8} {'pages/s':>16} {'p95 ms':>18} {'CER':>14} {'RSS MB':>14}")
+
+    def change(old, new, fmt):
+        if old is None or new is None:
+            return "-"
+        delta = f" ({(new - old) / old:+.0%})" if old else ""
+        return f"{new:{fmt}}{delta}"
+
+    for size, stages in candidate['runs'].items():
+        for stage, metrics in stages.items():
+            old = baseline['runs'].get(size, {}).get(stage)
+            if not old or 'skipped' in old or 'skipped' in metrics:
+                continue
+            print(f"{size:<8} {stage:<8} {change(old['pages_per_sec'], metrics['pages_per_sec'], '.1f'):>16} "
+                  f"{change(old['p95_ms'], metrics['p95_ms'], '.1f'):>18} "
+                  f"{change(old['cer'], metrics['cer'], '.3f'):>14} "
+                  f"{change(old['peak_rss_mb'], metrics['peak_rss_mb'], '.0f'):>14}")
+
+
+def benchmark(sizes, stages, options, output_dir=RESULTS_DIR, keep=False):
+    """Run the selected stages on synthetic corpora of each size and save the results as JSON"""
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'options': options,
+        'runs': {}
+    }
+    for size in sizes:
+        workspace = tempfile.mkdtemp(prefix=f"benchmark_{size}_")
+        try:
+            print(f"Generating {SIZES[size]} synthetic pages ({size})...")
+            corpus = make_corpus(workspace, SIZES[size])
+            results['runs'][size] = {}
+            for stage in stages:
+                print(f"  {stage}...")
+                results['runs'][size][stage] = run_stage(stage, workspace, corpus, options.get(stage, {}))
+        finally:
+            if keep:
+                print(f"Kept workspace {workspace}")
+            else:
+                shutil.rmtree(workspace, ignore_errors=True)
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print_results(results)
+    print(f"\nResults saved to {path}")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the pipeline stages on synthetic pages")
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['small', 'medium'])
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--dpi', type=int, default=200, help="Rendering resolution for the convert stage")
+    parser.add_argument('--ocr-workers', type=int, default=2)
+    parser.add_argument('--ocr-backend', choices=['auto', 'tesserocr', 'pytesseract'], default='auto')
+    parser.add_argument('--latency', type=float, default=0.2, help="Mock endpoint response delay in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.05, help="Fraction of mock requests answered with 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with the mock 429s")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent correction requests")
+    parser.add_argument('--output-dir', default=RESULTS_DIR)
+    parser.add_argument('--keep', action='store_true', help="Keep the generated corpora and outputs")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'),
+                        help="Compare two saved result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    options = {
+        'convert': {'dpi': args.dpi},
+        'ocr': {'workers': args.ocr_workers, 'backend': args.ocr_backend},
+        'correct': {'latency': args.latency, 'error_rate': args.error_rate,
+                    'retry_after': args.retry_after, 'concurrency': args.concurrency},
+        'analyze': {},
+    }
+    benchmark(args.sizes, args.stages, options, args.output_dir, args.keep)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import time
+import argparse
+import tracemalloc
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from sklearn.cluster import DBSCAN, HDBSCAN
+from sklearn.neighbors import NearestNeighbors
+
+# Above this many documents the approximate index is used when available
+APPROXIMATE_THRESHOLD = 20000
+
+
+def normalize(embeddings):
+    """L2-normalize rows, so Euclidean distance orders neighbours exactly like cosine distance"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.where(norms > 0, norms, 1)
+
+
+def build_neighbor_graph(embeddings, n_neighbors=30, method='auto'):
+    """Sparse, symmetric k-nearest-neighbour graph of cosine distances.
+
+    method is 'exact' (scikit-learn NearestNeighbors, computed in blocks so
+    memory stays O(n * k)), 'approximate' (pynndescent, roughly O(n log n)) or
+    'auto', which picks the approximate index for large corpora when
+    pynndescent is installed. The graph only depends on the embeddings, so it
+    can be built once and clustered with many settings.
+    """
+    vectors = normalize(embeddings)
+    if len(vectors) < 2:
+        # No neighbours to find; DBSCAN labels a lone document as noise
+        return sparse.csr_matrix((len(vectors), len(vectors)))
+    n_neighbors = min(n_neighbors, len(vectors) - 1)
+    if method == 'auto':
+        method = 'exact'
+        if len(vectors) > APPROXIMATE_THRESHOLD:
+            try:
+                import pynndescent  # noqa: F401
+                method = 'approximate'
+            except ImportError:
+                pass
+
+    if method == 'approximate':
+        from pynndescent import NNDescent
+        index = NNDescent(vectors, n_neighbors=n_neighbors + 1, metric='euclidean', random_state=42)
+        indices, distances = index.neighbor_graph
+        # Drop each point's match with itself
+        indices, distances = indices[:, 1:], distances[:, 1:]
+    else:
+        index = NearestNeighbors(n_neighbors=n_neighbors, metric='euclidean').fit(vectors)
+        distances, indices = index.kneighbors()
+
+    # For unit vectors cosine distance = |a - b|^2 / 2. Identical documents are
+    # at distance 0, which sparse matrices treat as a missing edge (maximum()
+    # below drops it), so floor the distances just above zero.
+    cosine = np.maximum((distances.astype(np.float64) ** 2) / 2, 1e-12)
+    rows = np.repeat(np.arange(len(vectors)), indices.shape[1])
+    graph = sparse.csr_matrix((cosine.ravel(), (rows, indices.ravel())), shape=(len(vectors), len(vectors)))
+    # Keep an edge if either end found it
+    return graph.maximum(graph.T).tocsr()
+
+
+def cluster_graph(graph, eps=0.5, min_samples=2):
+    """DBSCAN over a precomputed neighbour graph (cosine distances); noise is labelled -1.
+
+    Only edges in the graph are considered, so min_samples should not exceed
+    the graph's n_neighbors.
+    """
+    return DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed').fit_predict(graph)
+
+
+def connect_components(graph, distance=2.0):
+    """Chain the graph's connected components together with maximum-distance edges.
+
+    HDBSCAN needs a connected graph; edges at the largest possible cosine
+    distance join the components without merging any real clusters.
+    """
+    count, labels = connected_components(graph, directed=False)
+    if count == 1:
+        return graph
+    representatives = np.unique(labels, return_index=True)[1]
+    rows = np.concatenate([representatives[:-1], representatives[1:]])
+    cols = np.concatenate([representatives[1:], representatives[:-1]])
+    bridges = sparse.csr_matrix((np.full(len(rows), distance), (rows, cols)), shape=graph.shape)
+    return (graph + bridges).tocsr()
+
+
+def summarize_labels(labels):
+    """Cluster count, noise ratio and largest-cluster share of a labelling"""
+    clustered = labels[labels >= 0]
+    return {
+        'clusters': len(np.unique(clustered)),
+        'noise_ratio': float(np.mean(labels == -1)),
+        'largest_cluster': float(np.bincount(clustered).max() / len(labels)) if len(clustered) else 0.0
+    }
+
+
+def sweep(graph, eps_values, min_samples_values, min_cluster_sizes=()):
+    """Cluster one neighbour graph with every DBSCAN eps/min_samples pair and HDBSCAN min_cluster_size.
+
+    The expensive part, finding neighbours, is done once when the graph is
+    built; each setting here only walks the sparse graph.
+    """
+    results = []
+    for eps in eps_values:
+        for min_samples in min_samples_values:
+            start = time.perf_counter()
+            labels = cluster_graph(graph, eps, min_samples)
+            results.append(dict(method='dbscan', params=f"eps={eps:g} min_samples={min_samples}",
+                                seconds=time.perf_counter() - start, **summarize_labels(labels)))
+    if min_cluster_sizes:
+        connected = connect_components(graph)
+        for min_cluster_size in min_cluster_sizes:
+            start = time.perf_counter()
+            labels = HDBSCAN(min_cluster_size=min_cluster_size, metric='precomputed', copy=True).fit_predict(connected)
+            results.append(dict(method='hdbscan', params=f"min_cluster_size={min_cluster_size}",
+                                seconds=time.perf_counter() - start, **summarize_labels(labels)))
+    return results
+
+
+def print_sweep(results):
+    print(f"{'method':<8} {'settings':<26} {'clusters':>8} {'noise':>6} {'largest':>8} {'seconds':>8}")
+    for row in results:
+        print(f"{row['method']:<8} {row['params']:<26} {row['clusters']:>8} {row['noise_ratio']:>6.2f} "
+              f"{row['largest_cluster']:>8.2f} {row['seconds']:>8.3f}")
+
+
+def synthetic_embeddings(count, dim=384, clusters=50, spread=0.35, seed=42):
+    """Unit vectors scattered around random centres, shaped like sentence embeddings"""
+    rng = np.random.default_rng(seed)
+    centres = normalize(rng.standard_normal((clusters, dim)))
+    labels = rng.integers(0, clusters, count)
+    points = centres[labels] + spread * rng.standard_normal((count, dim)).astype(np.float32) / np.sqrt(dim)
+    return normalize(points)
+
+
+def measure(func, *args, **kwargs):
+    """Run func, returning (result, seconds, peak traced MB)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def check_against_brute_force(n_neighbors=30, eps=0.5, min_samples=2, seed=0):
+    """Labels from the graph path must match brute-force DBSCAN(metric='cosine') on edge cases.
+
+    Covers exact duplicates (zero-distance edges), a single document and a
+    corpus smaller than n_neighbors. Returns the names of the cases that differ.
+    """
+    rng = np.random.default_rng(seed)
+    duplicate = rng.standard_normal(384)
+    cases = {
+        'duplicates': np.vstack([np.tile(duplicate, (3, 1)), rng.standard_normal((4, 384))]),
+        'single document': rng.standard_normal((1, 384)),
+        'fewer than n_neighbors': synthetic_embeddings(n_neighbors // 2, clusters=3, seed=seed)
+    }
+    failures = []
+    for name, embeddings in cases.items():
+        labels = cluster_graph(build_neighbor_graph(embeddings, n_neighbors), eps, min_samples)
+        expected = DBSCAN(eps=eps, min_samples=min_samples, metric='cosine').fit_predict(embeddings)
+        matches = np.array_equal(labels, expected)
+        print(f"{name:<24} {'ok' if matches else 'MISMATCH'}  graph={labels.tolist()} brute={expected.tolist()}")
+        if not matches:
+            failures.append(name)
+    return failures
+
+
+def benchmark(sizes, n_neighbors=30, eps=0.5, min_samples=2, brute_limit=10000):
+    """Compare graph-based clustering with brute-force DBSCAN(metric='cosine') on synthetic data"""
+    print(f"{'docs':>8} {'method':<12} {'seconds':>8} {'peak MB':>8} {'clusters':>8} {'noise':>6}")
+    for size in sizes:
+        embeddings = synthetic_embeddings(size)
+
+        graph, graph_seconds, graph_peak = measure(build_neighbor_graph, embeddings, n_neighbors)
+        labels, cluster_seconds, cluster_peak = measure(cluster_graph, graph, eps, min_samples)
+        print(f"{size:>8} {'graph':<12} {graph_seconds + cluster_seconds:>8.2f} {max(graph_peak, cluster_peak):>8.0f} "
+              f"{len(set(labels) - {-1}):>8} {np.mean(labels == -1):>6.2f}")
+
+        if size <= brute_limit:
+            clusterer = DBSCAN(eps=eps, min_samples=min_samples, metric='cosine')
+            labels, seconds, peak = measure(clusterer.fit_predict, embeddings)
+            print(f"{size:>8} {'brute force':<12} {seconds:>8.2f} {peak:>8.0f} "
+                  f"{len(set(labels) - {-1}):>8} {np.mean(labels == -1):>6.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark neighbour-graph clustering on synthetic embeddings")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--neighbors', type=int, default=30, help="Neighbours per document in the graph")
+    parser.add_argument('--eps', type=float, default=0.5)
+    parser.add_argument('--min-samples', type=int, default=2)
+    parser.add_argument('--brute-limit', type=int, default=10000,
+                        help="Largest size to also run brute-force DBSCAN on")
+    parser.add_argument('--check', action='store_true',
+                        help="Only check the graph labels against brute-force DBSCAN on edge cases")
+    args = parser.parse_args()
+    if args.check:
+        raise SystemExit(1 if check_against_brute_force(args.neighbors, args.eps, args.min_samples) else 0)
+    benchmark(args.sizes, args.neighbors, args.eps, args.min_samples, args.brute_limit)
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 import os
-from pdf2image import convert_from_path
+import re
+import sys
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
 
 def create_directory_structure():
@@ -17,7 +21,50 @@ def create_directory_structure():
     
     return output_dir
 
-def convert_pdf_to_jpg(pdf_path, output_dir):
+def get_page_filename(name_without_ext, page_number, page_count):
+    """Output filename for a page: single-page PDFs keep their name, others get _page_N"""
+    if page_count == 1:
+        return f"{name_without_ext}.jpg"
+    return f"{name_without_ext}_page_{page_number}.jpg"
+
+def render_pages(pdf_path, first_page, last_page, dpi=200, grayscale=False):
+    """Render an inclusive page range of a PDF to PIL images"""
+    return convert_from_path(pdf_path, dpi=dpi, grayscale=grayscale,
+                             first_page=first_page, last_page=last_page)
+
+def extract_page_text(pdf_path, page_number):
+    """Return the embedded text layer of one PDF page, or "" if it has none.
+
+    Text comes out in reading order rather than with -layout, which pads
+    columns with runs of spaces that correction and indexing would have to undo.
+    """
+    try:
+        result = subprocess.run(
+            ['pdftotext', '-f', str(page_number), '-l', str(page_number), '-enc', 'UTF-8', pdf_path, '-'],
+            capture_output=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+    return result.stdout.decode('utf-8', errors='replace')
+
+def has_usable_text(text, min_chars=200, min_word_ratio=0.7):
+    """Check that a text layer is real running text rather than empty or garbled"""
+    words = text.split()
+    if len(text.strip()) < min_chars or not words:
+        return False
+    # Most tokens in a good text layer look like words, possibly with trailing punctuation
+    wordlike = sum(1 for word in words if re.fullmatch(r"[\(\[\"']?[A-Za-z][A-Za-z'\-]*[.,;:!?\)\]\"']*", word))
+    return wordlike / len(words) >= min_word_ratio
+
+def convert_pdf_to_jpg(pdf_path, output_dir, dpi=200, grayscale=False, window_size=8, use_text_layer=True):
+    """Convert a PDF to one JPEG per page, rendering window_size pages at a time.
+
+    Only one window of pages is held in memory, each page is written as soon as
+    it is rendered, and pages whose output already exists are skipped so an
+    interrupted conversion resumes where it stopped. With use_text_layer, pages
+    that already carry a usable text layer are saved as a .txt next to the JPEGs
+    instead, and the OCR scripts pass that text straight to correction.
+    """
     try:
         # Get the filename without extension and state code
         filename = os.path.basename(pdf_path)
@@ -26,31 +73,59 @@ def convert_pdf_to_jpg(pdf_path, output_dir):
         
         # Define output path
         output_subdir = os.path.join(output_dir, f"{state_code}_divorce_codes_jpg")
-        
-        # Convert PDF to images
-        pages = convert_from_path(pdf_path)
-        
-        # If there's only one page, save it directly
-        if len(pages) == 1:
-            output_path = os.path.join(output_subdir, f"{name_without_ext}.jpg")
-            pages[0].save(output_path, 'JPEG')
-        else:
-            # If there are multiple pages, save them with page numbers
-            for i, page in enumerate(pages):
-                output_path = os.path.join(output_subdir, f"{name_without_ext}_page_{i+1}.jpg")
-                page.save(output_path, 'JPEG')
-                
-        print(f"Successfully converted {filename}")
-        
+
+        page_count = pdfinfo_from_path(pdf_path)['Pages']
+        written = 0
+
+        for window_start in range(1, page_count + 1, window_size):
+            window_end = min(window_start + window_size - 1, page_count)
+
+            # Only handle the part of the window that is still missing
+            missing = []
+            for page_number in range(window_start, window_end + 1):
+                output_path = os.path.join(output_subdir, get_page_filename(name_without_ext, page_number, page_count))
+                text_path = os.path.splitext(output_path)[0] + ".txt"
+                if os.path.exists(output_path) or os.path.exists(text_path):
+                    continue
+
+                if use_text_layer:
+                    text = extract_page_text(pdf_path, page_number)
+                    if has_usable_text(text):
+                        # Same temporary-name write as the JPEGs: an existing .txt is never truncated
+                        with open(text_path + ".part", 'w', encoding='utf-8') as f:
+                            f.write(text)
+                        os.replace(text_path + ".part", text_path)
+                        written += 1
+                        continue
+
+                missing.append(page_number)
+            if not missing:
+                continue
+
+            pages = render_pages(pdf_path, missing[0], missing[-1], dpi=dpi, grayscale=grayscale)
+            for page_number, page in zip(range(missing[0], missing[-1] + 1), pages):
+                output_path = os.path.join(output_subdir, get_page_filename(name_without_ext, page_number, page_count))
+                if page_number in missing:
+                    # Write to a temporary name first so a crash never leaves a truncated page behind
+                    temp_path = output_path + ".part"
+                    page.save(temp_path, 'JPEG')
+                    os.replace(temp_path, output_path)
+                    written += 1
+                page.close()
+
+        print(f"Successfully converted {filename} ({written} new pages, {page_count - written} already present)")
+
     except Exception as e:
         print(f"Error converting {pdf_path}: {str(e)}")
 
-def main():
+def run(args):
+    """The `convert` command; args are parsed by legal_codes.cli"""
     # Create output directory structure
     output_dir = create_directory_structure()
     
     # Process each state directory
     state_dirs = ["al_divorce_codes", "nc_divorce_codes", "tn_divorce_codes"]
+    pdf_paths = []
     
     for state_dir in state_dirs:
         if os.path.exists(state_dir):
@@ -58,8 +133,22 @@ def main():
             pdf_files = [f for f in os.listdir(state_dir) if f.lower().endswith('.pdf')]
             
             for pdf_file in pdf_files:
-                pdf_path = os.path.join(state_dir, pdf_file)
-                convert_pdf_to_jpg(pdf_path, output_dir)
+                pdf_paths.append(os.path.join(state_dir, pdf_file))
+
+    # Convert several PDFs at once
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = [
+            executor.submit(convert_pdf_to_jpg, pdf_path, output_dir,
+                            args.dpi, args.color == 'gray', max(1, args.window),
+                            not args.no_text_layer)
+            for pdf_path in pdf_paths
+        ]
+        for future in as_completed(futures):
+            future.result()
+
+def main():
+    from legal_codes.cli import main as cli_main
+    cli_main(['convert', *sys.argv[1:]])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,70 @@
+import json
+import time
+import sqlite3
+import hashlib
+
+
+class CorrectionCache:
+    """Persistent cache of OpenAI corrections for identical requests.
+
+    The key is a SHA-256 over everything that determines the response: system
+    prompt, user prompt template, OCR text, model, temperature and max_tokens
+    (plus the chunk size when long texts are split). A change to any of them is
+    a miss, so stale corrections are never reused.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self.cost_saved = 0.0
+
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS correction_cache ("
+            "key TEXT PRIMARY KEY, result TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self.db.commit()
+
+    def key(self, system_prompt, prompt_template, text, model, temperature, max_tokens, chunk_tokens=None):
+        fields = [system_prompt, prompt_template, text, model, temperature, max_tokens]
+        if chunk_tokens is not None:
+            fields.append(chunk_tokens)
+        payload = json.dumps(fields)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached result dict for key, or None"""
+        row = self.db.execute("SELECT result FROM correction_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        result = json.loads(row[0])
+        self.record_hit(result)
+        return result
+
+    def record_hit(self, result):
+        """Count a request answered without calling the API"""
+        self.hits += 1
+        self.tokens_saved += result['total_tokens']
+        self.cost_saved += result['cost']
+
+    def put(self, key, result):
+        self.db.execute(
+            "INSERT OR REPLACE INTO correction_cache (key, result, created) VALUES (?, ?, ?)",
+            (key, json.dumps(result), time.time())
+        )
+        self.db.commit()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'tokens_saved': self.tokens_saved,
+            'cost_saved': self.cost_saved,
+            'entries': self.db.execute("SELECT COUNT(*) FROM correction_cache").fetchone()[0]
+        }
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,385 @@
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+from contextlib import nullcontext
+from difflib import SequenceMatcher
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import httpx
+import openai
+from openai import AsyncOpenAI
+import tiktoken
+
+SYSTEM_PROMPT = "You are a historical document transcription expert specializing in legal texts."
+
+CORRECTION_PROMPT = """Please correct this historical legal text. Fix OCR errors, punctuation, and formatting while preserving the original meaning and historical context. Rules:
+1. Fix obvious OCR errors (like '0' for 'O', '1' for 'l')
+2. Add appropriate punctuation and capitalization
+3. Fix spacing and line breaks
+4. Preserve original meaning and historical context
+5. Make best guesses for unclear words based on context
+6. Do not add or delete any content unless correcting clear errors
+7. Process the ENTIRE text - do not truncate or summarize
+
+Original text:
+"""
+
+logger = logging.getLogger(__name__)
+
+# GPT-4 pricing: $0.03/1K prompt tokens, $0.06/1K completion tokens
+PROMPT_COST_PER_1K = 0.03
+COMPLETION_COST_PER_1K = 0.06
+
+
+class QuotaExceededError(Exception):
+    """Raised when the API reports the account is out of quota, so retrying won't help"""
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate_per_minute, holding at most capacity tokens"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        """Wait until `amount` tokens are available and take them (waiters are served in order)"""
+        # A single request bigger than the bucket must still be allowed through eventually
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def refund(self, amount):
+        """Give back tokens that were reserved but not used"""
+        if amount > 0:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+def split_into_chunks(text, encoding, max_tokens, overlap_tokens=64):
+    """Split text into pieces of at most max_tokens tokens.
+
+    Breaks at paragraph boundaries where possible, then at line boundaries, and
+    only cuts inside a line when a single line is over budget. Every chunk after
+    the first starts with up to overlap_tokens of trailing lines from the
+    previous chunk, so each piece has some context; stitch_chunks removes the
+    duplicated overlap afterwards.
+    """
+    def count(piece):
+        return len(encoding.encode(piece))
+
+    if count(text) <= max_tokens:
+        return [text]
+
+    # Paragraphs keep their trailing blank lines so joining them restores the text
+    units = []
+    for paragraph in re.split(r'(?<=\n)(?=\s*\n)', text):
+        if count(paragraph) <= max_tokens:
+            units.append(paragraph)
+            continue
+        for line in paragraph.splitlines(keepends=True):
+            if count(line) <= max_tokens:
+                units.append(line)
+                continue
+            tokens = encoding.encode(line)
+            units.extend(encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens))
+
+    chunks = []
+    current = ""
+    for unit in units:
+        if current.strip() and count(current + unit) > max_tokens:
+            chunks.append(current)
+            # Carry the last few lines over as context for the next chunk
+            overlap = ""
+            for line in reversed(current.splitlines(keepends=True)):
+                if count(line + overlap) > overlap_tokens:
+                    break
+                overlap = line + overlap
+            current = overlap if count(overlap + unit) <= max_tokens else ""
+        current += unit
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def stitch_chunks(corrected_chunks, window_words=80, min_match_words=3):
+    """Join corrected chunks in order, dropping text repeated from the previous chunk's overlap"""
+    def normalize(word):
+        return re.sub(r'[^a-z0-9]', '', word.lower())
+
+    stitched = corrected_chunks[0] if corrected_chunks else ""
+    for chunk in corrected_chunks[1:]:
+        tail = [normalize(word) for word in stitched.split()[-window_words:]]
+        head_words = list(re.finditer(r'\S+', chunk))[:window_words]
+        head = [normalize(match.group()) for match in head_words]
+
+        # The overlap is the longest run that ends the previous chunk and starts this one;
+        # matching loosely tolerates the model correcting the two copies slightly differently
+        match = SequenceMatcher(None, tail, head, autojunk=False).find_longest_match(0, len(tail), 0, len(head))
+        slack = 3
+        if (match.size >= min_match_words
+                and match.a + match.size >= len(tail) - slack
+                and match.b <= slack):
+            chunk = chunk[head_words[match.b + match.size - 1].end():]
+
+        stitched = stitched.rstrip() + "\n" + chunk.lstrip()
+    return stitched
+
+
+def parse_retry_after(headers):
+    """Return the server-requested wait in seconds from Retry-After style headers, or None"""
+    if headers is None:
+        return None
+    retry_after_ms = headers.get('retry-after-ms')
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+    retry_after = headers.get('retry-after')
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    # Retry-After may also be an HTTP date
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class CorrectionEngine:
+    """Asynchronous OpenAI correction client with bounded concurrency and rate limiting.
+
+    Keeps at most `max_concurrency` requests in flight, paces them with token buckets
+    for requests/min and tokens/min, and retries transient failures with jittered
+    exponential backoff that honours Retry-After. Texts longer than
+    max_chunk_tokens are split and the pieces corrected concurrently; each
+    request's max_tokens is sized from its input, up to max_tokens. Set
+    OPENAI_BASE_URL (or pass base_url) to point it at a local OpenAI-compatible
+    server such as mock_openai_server.py.
+    """
+
+    def __init__(self, model="gpt-4", temperature=0.3, max_tokens=4000,
+                 max_concurrency=8, requests_per_minute=500, tokens_per_minute=40000,
+                 max_retries=6, base_delay=1.0, max_delay=60.0,
+                 api_key=None, base_url=None, cache=None,
+                 max_chunk_tokens=2000, chunk_overlap_tokens=64, tracer=None):
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.max_chunk_tokens = max_chunk_tokens
+        self.chunk_overlap_tokens = chunk_overlap_tokens
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.api_key = api_key or os.getenv('OPENAI_API_KEY')
+        self.base_url = base_url or os.getenv('OPENAI_BASE_URL')
+
+        self.encoding = tiktoken.encoding_for_model(model)
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.client = None
+
+        # Optional CorrectionCache; identical requests in flight are merged into one
+        self.cache = cache
+        self.inflight = {}
+
+        # Optional telemetry.Tracer; records rate-limit waits, API calls and backoff sleeps
+        self.tracer = tracer
+
+    def span(self, stage, **attributes):
+        if self.tracer is None:
+            return nullcontext({})
+        return self.tracer.span(stage, **attributes)
+
+    def _get_client(self):
+        # Created lazily so the pooled HTTP client binds to the running event loop
+        if self.client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+                timeout=httpx.Timeout(600.0, connect=10.0)
+            )
+            # Retries are handled here so they share the rate limiters
+            self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                      http_client=http_client, max_retries=0)
+        return self.client
+
+    def count_tokens(self, text):
+        """Count prompt tokens the same way the cost estimate does"""
+        return len(self.encoding.encode(CORRECTION_PROMPT + text))
+
+    def estimate_cost(self, text):
+        """Estimated cost of correcting text in one request, assuming a same-length reply"""
+        prompt_tokens = self.count_tokens(text)
+        completion_tokens = len(self.encoding.encode(text))
+        return (prompt_tokens / 1000) * PROMPT_COST_PER_1K + (completion_tokens / 1000) * COMPLETION_COST_PER_1K
+
+    def completion_budget(self, input_tokens):
+        """max_tokens for a request: room for a corrected copy of the input, capped at max_tokens"""
+        return min(self.max_tokens, int(input_tokens * 1.5) + 100)
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    async def correct(self, text):
+        """Correct one OCR text and return the corrected text with token/cost stats.
+
+        Results served from the cache or merged with an identical in-flight
+        request are marked with 'cached': True and cost nothing.
+        """
+        if self.cache is None:
+            return await self.correct_uncached(text)
+
+        key = self.cache.key(SYSTEM_PROMPT, CORRECTION_PROMPT, text,
+                             self.model, self.temperature, self.max_tokens,
+                             chunk_tokens=self.max_chunk_tokens)
+
+        if key in self.inflight:
+            result = await asyncio.shield(self.inflight[key])
+            self.cache.record_hit(result)
+            return dict(result, cached=True, retries=0)
+
+        cached_result = self.cache.get(key)
+        if cached_result is not None:
+            return dict(cached_result, cached=True, retries=0)
+
+        task = asyncio.ensure_future(self.correct_uncached(text))
+        self.inflight[key] = task
+        try:
+            result = await asyncio.shield(task)
+        finally:
+            del self.inflight[key]
+
+        self.cache.put(key, {name: value for name, value in result.items() if name != 'retries'})
+        return result
+
+    async def correct_uncached(self, text):
+        """Correct a text, splitting it into concurrently corrected chunks if it is long"""
+        chunks = split_into_chunks(text, self.encoding, self.max_chunk_tokens, self.chunk_overlap_tokens)
+        if len(chunks) == 1:
+            return await self.request_correction(text)
+
+        tasks = [asyncio.ensure_future(self.request_correction(chunk)) for chunk in chunks]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # One failed chunk fails the page; stop the others spending rate-limit budget on it
+            for task in tasks:
+                task.cancel()
+            raise
+        return {
+            'text': stitch_chunks([result['text'] for result in results]),
+            'prompt_tokens': sum(result['prompt_tokens'] for result in results),
+            'completion_tokens': sum(result['completion_tokens'] for result in results),
+            'total_tokens': sum(result['total_tokens'] for result in results),
+            'cost': sum(result['cost'] for result in results),
+            'retries': sum(result['retries'] for result in results),
+            'cached': False,
+            'chunks': len(chunks)
+        }
+
+    async def request_correction(self, text):
+        """Call the API (with rate limiting and retries) to correct one OCR text"""
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": CORRECTION_PROMPT + text}
+        ]
+        prompt_tokens = self.count_tokens(text)
+        max_tokens = self.completion_budget(len(self.encoding.encode(text)))
+        # The API counts max_tokens against the tokens/min limit when the request is made
+        reserved_tokens = prompt_tokens + max_tokens
+
+        request_bytes = sum(len(message['content'].encode('utf-8')) for message in messages)
+
+        for attempt in range(self.max_retries + 1):
+            with self.span('api.rate_limit', attempt=attempt):
+                await self.request_bucket.acquire(1)
+                await self.token_bucket.acquire(reserved_tokens)
+
+            retry_after = None
+            async with self.semaphore:
+                with self.span('api.request', attempt=attempt, bytes_in=request_bytes) as span:
+                    try:
+                        response = await self._get_client().chat.completions.create(
+                            model=self.model,
+                            messages=messages,
+                            temperature=self.temperature,
+                            max_tokens=max_tokens
+                        )
+                        error = None
+                        span['bytes_out'] = len((response.choices[0].message.content or "").encode('utf-8'))
+                    except openai.RateLimitError as e:
+                        if "insufficient_quota" in str(e):
+                            raise QuotaExceededError(str(e)) from e
+                        error = e
+                        retry_after = parse_retry_after(e.response.headers)
+                    except openai.InternalServerError as e:
+                        error = e
+                        retry_after = parse_retry_after(e.response.headers)
+                    except (openai.APIConnectionError, openai.APITimeoutError) as e:
+                        error = e
+                    if error is not None:
+                        span['error'] = type(error).__name__
+
+            if error is None:
+                break
+            if attempt == self.max_retries:
+                raise error
+            wait_time = self.backoff_delay(attempt, retry_after)
+            logger.warning("Error processing with OpenAI (attempt %d/%d): %s; retrying in %.1fs",
+                           attempt + 1, self.max_retries + 1, error, wait_time)
+            with self.span('api.backoff', attempt=attempt, retries=1):
+                await asyncio.sleep(wait_time)
+
+        completion_tokens = response.usage.completion_tokens
+        total_tokens = response.usage.total_tokens
+        logger.debug("OpenAI request: %d prompt tokens, %d completion tokens (max_tokens %d), %d retries",
+                     prompt_tokens, completion_tokens, max_tokens, attempt)
+        self.token_bucket.refund(max_tokens - completion_tokens)
+
+        prompt_cost = (prompt_tokens / 1000) * PROMPT_COST_PER_1K
+        completion_cost = (completion_tokens / 1000) * COMPLETION_COST_PER_1K
+
+        return {
+            'text': response.choices[0].message.content,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': total_tokens,
+            'cost': prompt_cost + completion_cost,
+            'retries': attempt,
+            'cached': False,
+            'chunks': 1
+        }
+
+    async def close(self):
+        """Close pooled HTTP connections"""
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
@@ -0,0 +1,278 @@
+import os
+import re
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+
+DEFAULT_MODEL = 'all-MiniLM-L6-v2'
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class VectorFile:
+    """A raw float32 matrix file plus a JSON-lines index with one entry per row.
+
+    The first index line is a header describing how the vectors were made; a
+    store whose header doesn't match is discarded and rebuilt. Rows are
+    appended, and the index lines for a batch are written after its vectors, so
+    an interrupted write just loses the tail.
+    """
+
+    def __init__(self, matrix_file, index_file, header):
+        self.matrix_file = matrix_file
+        self.index_file = index_file
+        self.header = header
+        self.dim = None
+        self.entries = []
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.index_file):
+            return
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        if not lines:
+            return
+        header = json.loads(lines[0])
+        if {key: header.get(key) for key in self.header} != self.header:
+            print(f"{self.index_file} was built with different settings; rebuilding")
+            self.clear()
+            return
+        self.dim = header['dim']
+        for line in lines[1:]:
+            try:
+                self.entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                break  # Partially written last line
+
+        # Drop vectors written without their index lines
+        expected = len(self.entries) * self.dim * 4
+        if os.path.exists(self.matrix_file) and os.path.getsize(self.matrix_file) > expected:
+            with open(self.matrix_file, 'r+b') as f:
+                f.truncate(expected)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def matrix(self):
+        """All stored vectors as a read-only memory map (rows in index order)"""
+        if not self.entries:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self.matrix_file, dtype=np.float32, mode='r', shape=(len(self.entries), self.dim))
+
+    def append(self, vectors, entries):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            os.makedirs(os.path.dirname(self.index_file) or '.', exist_ok=True)
+            with open(self.index_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(dict(self.header, dim=self.dim)) + "\n")
+            open(self.matrix_file, 'wb').close()
+        with open(self.matrix_file, 'ab') as f:
+            f.write(vectors.tobytes())
+        with open(self.index_file, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+        self.entries.extend(entries)
+
+    def clear(self):
+        self.dim = None
+        self.entries = []
+        for path in (self.matrix_file, self.index_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class EmbeddingStore:
+    """Persistent document embeddings keyed by text content hash and model name.
+
+    Vectors live in a raw float32 matrix (embeddings_<model>.f32) that is
+    memory-mapped on read, with a JSON-lines index of content hashes next to
+    it. Only texts whose hash isn't in the index are encoded; unchanged pages
+    load straight from the mmap.
+
+    The model only sees max_seq_length tokens at a time, so each document is
+    split into overlapping token windows, the windows are encoded in batches of
+    similar length (little padding), and the window vectors are averaged,
+    weighted by token count, into the document vector. With keep_chunks the
+    window vectors and their character spans are also stored
+    (embeddings_<model>_chunks.f32) for passage-level retrieval.
+    """
+
+    def __init__(self, directory="ocr_ai_results", model_name=DEFAULT_MODEL, window_overlap=32,
+                 batch_size=32, keep_chunks=False):
+        self.directory = directory
+        self.model_name = model_name
+        self.model = None
+        self.window_overlap = window_overlap
+        self.batch_size = batch_size
+        self.keep_chunks = keep_chunks
+        # Filled in by each add() call that encodes something
+        self.last_stats = None
+
+        slug = re.sub(r'[^A-Za-z0-9.-]+', '_', model_name)
+        header = {'model': model_name, 'pooling': 'token_weighted_mean', 'window_overlap': window_overlap}
+        self.documents = VectorFile(os.path.join(directory, f"embeddings_{slug}.f32"),
+                                    os.path.join(directory, f"embeddings_{slug}_index.jsonl"), header)
+        self.chunks = VectorFile(os.path.join(directory, f"embeddings_{slug}_chunks.f32"),
+                                 os.path.join(directory, f"embeddings_{slug}_chunks_index.jsonl"), header)
+        self.rows = {}
+        for row, entry in enumerate(self.documents.entries):
+            self.rows.setdefault(entry['hash'], row)
+
+    @property
+    def matrix_file(self):
+        return self.documents.matrix_file
+
+    @property
+    def dim(self):
+        return self.documents.dim
+
+    def __len__(self):
+        return len(self.documents)
+
+    def __contains__(self, text_hash):
+        return text_hash in self.rows
+
+    def matrix(self):
+        """All stored document vectors as a read-only memory map"""
+        return self.documents.matrix()
+
+    def load_model(self):
+        if self.model is None:
+            # Imported here so loading cached embeddings never loads torch
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(self.model_name)
+        return self.model
+
+    def split_windows(self, text):
+        """Split a text into overlapping windows that each fit the model; returns (start, end, tokens) spans"""
+        model = self.load_model()
+        window = model.max_seq_length - 2  # Room for [CLS] and [SEP]
+        encoding = model.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        offsets = encoding['offset_mapping']
+        if not offsets:
+            return [(0, len(text), 0)]
+        step = max(1, window - self.window_overlap)
+        spans = []
+        for start in range(0, max(len(offsets) - self.window_overlap, 1), step):
+            end = min(start + window, len(offsets))
+            spans.append((offsets[start][0], offsets[end - 1][1], end - start))
+        return spans
+
+    def encode(self, texts, show_progress_bar=False):
+        """Document vectors for texts, plus (document index, start, end, vector) for every window"""
+        model = self.load_model()
+        windows, owners, spans, lengths = [], [], [], []
+        for i, text in enumerate(texts):
+            for start, end, tokens in self.split_windows(text):
+                windows.append(text[start:end])
+                owners.append(i)
+                spans.append((start, end))
+                lengths.append(tokens)
+        lengths = np.asarray(lengths)
+
+        # Sort windows by length so each batch pads to roughly the same size
+        order = np.argsort(lengths, kind='stable')
+        batches = [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+        if show_progress_bar:
+            from tqdm import tqdm
+            batches = tqdm(batches, desc="Encoding windows")
+        started = time.perf_counter()
+        window_vectors = None
+        for batch in batches:
+            vectors = model.encode([windows[i] for i in batch], batch_size=len(batch), show_progress_bar=False)
+            if window_vectors is None:
+                window_vectors = np.empty((len(windows), vectors.shape[1]), dtype=np.float32)
+            window_vectors[batch] = vectors
+        seconds = time.perf_counter() - started
+
+        # Windows of a document are contiguous, so pool them with one reduceat
+        weights = np.maximum(lengths, 1).astype(np.float32)[:, None]
+        starts = np.searchsorted(owners, np.arange(len(texts)))
+        pooled = np.add.reduceat(window_vectors * weights, starts) / np.add.reduceat(weights, starts)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        pooled = pooled / np.where(norms > 0, norms, 1)
+
+        self.last_stats = {
+            'documents': len(texts),
+            'windows': len(windows),
+            'tokens': int(lengths.sum()),
+            'seconds': seconds,
+            'tokens_per_second': float(lengths.sum() / seconds) if seconds > 0 else 0.0
+        }
+        chunks = [(owner, start, end, vector) for owner, (start, end), vector in zip(owners, spans, window_vectors)]
+        return pooled.astype(np.float32), chunks
+
+    def add(self, texts, show_progress_bar=False):
+        """Encode and store the texts that aren't stored yet; returns how many were encoded"""
+        missing = {}
+        for text in texts:
+            text_hash = content_hash(text)
+            if text_hash not in self.rows and text_hash not in missing:
+                missing[text_hash] = text
+        if not missing:
+            return 0
+
+        hashes = list(missing)
+        vectors, chunks = self.encode(list(missing.values()), show_progress_bar)
+        if self.keep_chunks:
+            self.chunks.append(np.array([vector for _, _, _, vector in chunks]),
+                               [{'hash': hashes[owner], 'start': start, 'end': end} for owner, start, end, _ in chunks])
+        base = len(self.documents)
+        self.documents.append(vectors, [{'hash': text_hash} for text_hash in hashes])
+        for offset, text_hash in enumerate(hashes):
+            self.rows[text_hash] = base + offset
+        return len(missing)
+
+    def embed(self, texts, show_progress_bar=False):
+        """Embeddings for texts in order, encoding only new or changed ones"""
+        self.add(texts, show_progress_bar)
+        rows = [self.rows[content_hash(text)] for text in texts]
+        return np.asarray(self.matrix()[rows])
+
+    def compact(self, keep_hashes):
+        """Rewrite the store with only the given hashes, dropping vectors of changed or deleted pages"""
+        keep = [text_hash for text_hash in dict.fromkeys(keep_hashes) if text_hash in self.rows]
+        vectors = np.asarray(self.matrix()[[self.rows[text_hash] for text_hash in keep]])
+        kept = set(keep)
+        chunk_rows = [row for row, entry in enumerate(self.chunks.entries) if entry['hash'] in kept]
+        chunk_vectors = np.asarray(self.chunks.matrix()[chunk_rows])
+        chunk_entries = [self.chunks.entries[row] for row in chunk_rows]
+
+        self.documents.clear()
+        self.chunks.clear()
+        self.rows = {}
+        if keep:
+            self.documents.append(vectors, [{'hash': text_hash} for text_hash in keep])
+            self.rows = {text_hash: row for row, text_hash in enumerate(keep)}
+        if chunk_rows:
+            self.chunks.append(chunk_vectors, chunk_entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or compact the embedding store")
+    parser.add_argument('--dir', default="ocr_ai_results")
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--compact', action='store_true',
+                        help="Drop vectors of pages that no longer match any *_corrected.txt")
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.dir, args.model)
+    if args.compact:
+        # Imported here to keep this module free of the analysis dependencies
+        from analyze_legal_codes import load_legal_texts
+        texts, _ = load_legal_texts()
+        before = len(store)
+        store.compact(content_hash(text) for text in texts)
+        print(f"Compacted {before} -> {len(store)} vectors")
+    print(f"Model: {store.model_name}")
+    print(f"Vectors: {len(store)} x {store.dim}")
+    print(f"Chunk vectors: {len(store.chunks)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import os
+import re
+import math
+import sqlite3
+import hashlib
+import argparse
+import unicodedata
+from array import array
+from collections import defaultdict
+from local_corrector import LIGATURES
+
+# Older spellings that turn up in the codes, folded to their modern form at index and query time
+PERIOD_SPELLINGS = {
+    'shew': 'show',
+    'shewn': 'shown',
+    'shewing': 'showing',
+    'shewed': 'showed',
+    'connexion': 'connection',
+    'publick': 'public',
+    'compleat': 'complete',
+    'chuse': 'choose',
+    'intituled': 'entitled',
+}
+
+# Query-time variants per term are capped so long words with many s's stay cheap
+MAX_VARIANTS = 16
+
+
+def normalize_text(text):
+    """Lowercase, fold ligatures, long s and accents so period typography matches modern queries"""
+    for ligature, replacement in LIGATURES.items():
+        text = text.replace(ligature, replacement)
+    text = unicodedata.normalize('NFKD', text)
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    """(term, start, end) for every word in text; offsets point into the original text"""
+    for match in re.finditer(r"\w+", text):
+        term = re.sub(r"[^a-z0-9]", "", normalize_text(match.group()))
+        if term:
+            yield PERIOD_SPELLINGS.get(term, term), match.start(), match.end()
+
+
+def long_s_variants(term):
+    """The term plus the spellings OCR produces when a long s is read as 'f' (e.g. 'shall' -> 'fhall').
+
+    A long s never ends a word, so only non-final s's are swapped.
+    """
+    positions = [i for i, ch in enumerate(term[:-1]) if ch == 's']
+    variants = {term}
+    for mask in range(1, 2 ** len(positions)):
+        if len(variants) >= MAX_VARIANTS:
+            break
+        chars = list(term)
+        for bit, position in enumerate(positions):
+            if mask >> bit & 1:
+                chars[position] = 'f'
+        variants.add("".join(chars))
+    return variants
+
+
+def parse_query(query):
+    """Split a query into phrases (quoted) and single terms; returns a list of term lists"""
+    parts = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\S+)', query):
+        terms = [term for term, _, _ in tokenize(phrase or word)]
+        if terms:
+            parts.append(terms)
+    return parts
+
+
+class KeywordIndex:
+    """BM25 inverted index over the OCR and corrected page texts, stored in SQLite.
+
+    Postings keep each term's word positions in a document, so quoted phrases
+    ("bed and board") can be matched exactly. update() only re-reads files whose
+    size or modification time changed, and only re-indexes them if their
+    content hash changed too; files that disappeared are dropped.
+    """
+
+    def __init__(self, path=os.path.join("ocr_ai_results", "keyword_index.sqlite"), k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, file TEXT NOT NULL, state TEXT NOT NULL, "
+            "kind TEXT NOT NULL, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, hash TEXT NOT NULL, "
+            "length INTEGER NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, doc_id INTEGER NOT NULL, positions BLOB NOT NULL, "
+            "PRIMARY KEY (term, doc_id)) WITHOUT ROWID"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id)")
+        self.db.commit()
+
+    def update(self, entries=None):
+        """Index new and changed files; entries are load_legal_texts-style dicts (file, state, path).
+
+        Defaults to every *_corrected.txt and *_ocr.txt in ocr_ai_results.
+        Returns (indexed, unchanged, removed) counts.
+        """
+        if entries is None:
+            # Imported here so searching doesn't load the analysis dependencies
+            from analyze_legal_codes import find_legal_files
+            entries = find_legal_files("*_corrected.txt") + find_legal_files("*_ocr.txt")
+
+        known = {row[0]: row[1:] for row in self.db.execute("SELECT path, id, mtime_ns, size, hash FROM documents")}
+        indexed = unchanged = 0
+        with self.db:
+            for entry in entries:
+                path = entry['path']
+                stat = os.stat(path)
+                previous = known.pop(path, None)
+                if previous and previous[1:3] == (stat.st_mtime_ns, stat.st_size):
+                    unchanged += 1
+                    continue
+
+                with open(path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+                text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+                if previous and previous[3] == text_hash:
+                    self.db.execute("UPDATE documents SET mtime_ns = ?, size = ? WHERE id = ?",
+                                    (stat.st_mtime_ns, stat.st_size, previous[0]))
+                    unchanged += 1
+                    continue
+                if previous:
+                    self.remove(previous[0])
+                self.add(entry, text, text_hash, stat)
+                indexed += 1
+
+            for doc_id, _, _, _ in known.values():
+                self.remove(doc_id)
+        return indexed, unchanged, len(known)
+
+    def add(self, entry, text, text_hash, stat):
+        positions = defaultdict(lambda: array('I'))
+        length = 0
+        for position, (term, _, _) in enumerate(tokenize(text)):
+            positions[term].append(position)
+            length += 1
+        kind = 'corrected' if entry['file'].endswith('_corrected.txt') else 'ocr'
+        doc_id = self.db.execute(
+            "INSERT INTO documents (path, file, state, kind, mtime_ns, size, hash, length) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (entry['path'], entry['file'], entry['state'], kind, stat.st_mtime_ns, stat.st_size, text_hash, length)
+        ).lastrowid
+        self.db.executemany("INSERT INTO postings (term, doc_id, positions) VALUES (?, ?, ?)",
+                            [(term, doc_id, term_positions.tobytes()) for term, term_positions in positions.items()])
+
+    def remove(self, doc_id):
+        self.db.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+        self.db.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+
+    def postings(self, term):
+        """doc_id -> sorted positions for a term, merged over its long-s OCR variants.
+
+        Variants only match raw OCR documents, and a variant that is itself a
+        word in the corrected texts ('sound' -> 'found', 'sell' -> 'fell') is
+        not treated as a misreading at all.
+        """
+        variants = list(long_s_variants(term) - {term})
+        if variants:
+            real_words = {row[0] for row in self.db.execute(
+                "SELECT DISTINCT postings.term FROM postings JOIN documents ON documents.id = postings.doc_id "
+                f"WHERE postings.term IN ({','.join('?' * len(variants))}) AND documents.kind = 'corrected'",
+                variants)}
+            variants = [variant for variant in variants if variant not in real_words]
+        merged = defaultdict(list)
+        query = (
+            "SELECT postings.doc_id, postings.positions FROM postings JOIN documents ON documents.id = postings.doc_id "
+            f"WHERE postings.term = ? OR (postings.term IN ({','.join('?' * len(variants))}) AND documents.kind = 'ocr')"
+        )
+        for doc_id, blob in self.db.execute(query, [term, *variants]):
+            positions = array('I')
+            positions.frombytes(blob)
+            merged[doc_id].extend(positions)
+        return {doc_id: sorted(positions) for doc_id, positions in merged.items()}
+
+    @staticmethod
+    def phrase_positions(term_postings, doc_id):
+        """Start positions where the phrase's terms occur consecutively in a document"""
+        starts = set(term_postings[0][doc_id])
+        for offset, postings in enumerate(term_postings[1:], 1):
+            starts &= {position - offset for position in postings[doc_id]}
+            if not starts:
+                break
+        return sorted(starts)
+
+    def search(self, query, k=10, state=None, kind=None):
+        """BM25-ranked documents for a query; every quoted phrase must appear in a match.
+
+        Returns dicts with file, state, kind, path, score and the first match position.
+        """
+        parts = parse_query(query)
+        if not parts:
+            return []
+        where, params = [], []
+        if state:
+            where.append("state = ?")
+            params.append(state.upper())
+        if kind:
+            where.append("kind = ?")
+            params.append(kind)
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        documents = {row[0]: row[1:] for row in self.db.execute(
+            f"SELECT id, file, state, kind, path, length FROM documents{clause}", params)}
+        if not documents:
+            return []
+        total = self.db.execute("SELECT COUNT(*), AVG(length) FROM documents").fetchone()
+        count, average_length = total[0], total[1] or 1
+
+        scores = defaultdict(float)
+        first_match = {}
+        required = None
+        for terms in parts:
+            term_postings = [self.postings(term) for term in terms]
+            if len(terms) > 1:
+                # Phrase: only documents with all terms in order
+                candidates = set.intersection(*(set(postings) for postings in term_postings)) & documents.keys()
+                matches = {}
+                for doc_id in candidates:
+                    starts = self.phrase_positions(term_postings, doc_id)
+                    if starts:
+                        matches[doc_id] = starts
+                required = set(matches) if required is None else required & set(matches)
+                for doc_id, starts in matches.items():
+                    first_match.setdefault(doc_id, starts[0])
+            for postings in term_postings:
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, positions in postings.items():
+                    if doc_id not in documents:
+                        continue
+                    tf = len(positions)
+                    length = documents[doc_id][4]
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / average_length))
+                    if len(terms) == 1:
+                        first_match.setdefault(doc_id, positions[0])
+
+        if required is not None:
+            scores = {doc_id: score for doc_id, score in scores.items() if doc_id in required}
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:k]
+        return [{
+            'file': documents[doc_id][0],
+            'state': documents[doc_id][1],
+            'kind': documents[doc_id][2],
+            'path': documents[doc_id][3],
+            'score': round(score, 4),
+            'position': first_match.get(doc_id, 0)
+        } for doc_id, score in ranked]
+
+    def snippet(self, result, width=160):
+        """Text around a result's first match"""
+        with open(result['path'], 'r', encoding='utf-8') as f:
+            text = f.read()
+        for position, (_, start, end) in enumerate(tokenize(text)):
+            if position == result['position']:
+                break
+        else:
+            start = end = 0
+        return " ".join(text[max(0, start - width // 2):end + width // 2].split())
+
+    def stats(self):
+        return {
+            'documents': self.db.execute("SELECT COUNT(*) FROM documents").fetchone()[0],
+            'terms': self.db.execute("SELECT COUNT(DISTINCT term) FROM postings").fetchone()[0],
+            'bytes': os.path.getsize(self.path)
+        }
+
+    def close(self):
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword (BM25) search over the OCR and corrected texts")
+    parser.add_argument('query', nargs='*', help='Query terms; quote phrases, e.g. \'"bed and board" alimony\'')
+    parser.add_argument('--update', action='store_true', help="Index new and changed files first")
+    parser.add_argument('-k', type=int, default=10, help="Results to show")
+    parser.add_argument('--state', help="Only search this state (AL, NC, TN)")
+    parser.add_argument('--kind', choices=['corrected', 'ocr'], help="Only search corrected or raw OCR text")
+    args = parser.parse_args()
+
+    index = KeywordIndex()
+    if args.update or not index.stats()['documents']:
+        indexed, unchanged, removed = index.update()
+        print(f"Indexed {indexed} files ({unchanged} unchanged, {removed} removed)")
+
+    if args.query:
+        for rank, result in enumerate(index.search(" ".join(args.query), args.k, args.state, args.kind), 1):
+            print(f"{rank:>3}. [{result['state']}] {result['file']} ({result['score']:.2f})")
+            print(f"     {index.snippet(result)}")
+    index.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+"""Command-line front end for the legal codes OCR and analysis tools.
+
+Run `python -m legal_codes --help` from the repository root. Each command
+imports the module that implements it only when it runs, so heavy libraries
+(OpenAI, Tesseract bindings, torch, UMAP, plotly) never load for --help or
+status.
+"""
@@ -0,0 +1,4 @@
+from legal_codes.cli import main
+
+if __name__ == "__main__":
+    main()
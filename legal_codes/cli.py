@@ -0,0 +1,126 @@
+import os
+import logging
+import argparse
+import importlib
+
+LOG_LEVELS = ['debug', 'info', 'warning', 'error']
+
+# Libraries that flood the output: held at INFO when debugging and at WARNING otherwise
+NOISY_LOGGERS = ['PIL', 'openai', 'httpcore', 'httpx', 'urllib3', 'numba', 'matplotlib', 'filelock', 'asyncio']
+
+
+def add_engine_arguments(parser):
+    # None means the OPENAI_RPM / OPENAI_TPM environment variables (or .env), else 500 / 40000
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="Maximum OpenAI requests in flight")
+    parser.add_argument('--rpm', type=int, default=None,
+                        help="OpenAI requests-per-minute limit (default: $OPENAI_RPM or 500)")
+    parser.add_argument('--tpm', type=int, default=None,
+                        help="OpenAI tokens-per-minute limit (default: $OPENAI_TPM or 40000)")
+    parser.add_argument('--confidence-threshold', type=float, default=85,
+                        help="Tesseract confidence below which text is sent to OpenAI (above 100 sends every page)")
+
+
+def add_telemetry_arguments(parser):
+    parser.add_argument('--trace', metavar='FILE',
+                        help="Write the run's stage spans as a Chrome trace-event file")
+    parser.add_argument('--prometheus', metavar='FILE',
+                        help="Write per-stage histograms and counters in the Prometheus text format")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="Run the processing loop under cProfile and save the stats to FILE")
+
+
+def build_parser():
+    """The command-line parser; building it imports nothing beyond the standard library"""
+    parser = argparse.ArgumentParser(prog="legal_codes",
+                                     description="OCR, correct and analyze the state divorce codes")
+    parser.add_argument('--log-level', choices=LOG_LEVELS, default='info',
+                        help="Logging verbosity; 'debug' adds per-page and per-request detail")
+    parser.add_argument('--debug', dest='log_level', action='store_const', const='debug',
+                        help="Same as --log-level debug")
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+
+    convert = commands.add_parser('convert', help="Convert the source PDFs to per-page JPEGs",
+                                  description="Convert the divorce code PDFs to per-page JPEGs")
+    convert.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                         help="Number of PDFs to convert in parallel")
+    convert.add_argument('--dpi', type=int, default=200, help="Rendering resolution")
+    convert.add_argument('--color', choices=['rgb', 'gray'], default='rgb', help="Colour mode of the output pages")
+    convert.add_argument('--window', type=int, default=8, help="Pages rendered into memory at a time")
+    convert.add_argument('--no-text-layer', action='store_true',
+                         help="Always rasterize, even when a page has a usable embedded text layer")
+    convert.set_defaults(handler='convert_pdfs:run')
+
+    ocr = commands.add_parser('ocr', help="OCR and correct every page not processed yet",
+                              description="OCR and AI-correct the divorce code page images, resuming "
+                                          "where the last run stopped")
+    ocr.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                     help="Number of parallel Tesseract processes")
+    add_engine_arguments(ocr)
+    ocr.add_argument('--preprocess', action='store_true',
+                     help="Grayscale, binarize, deskew, crop and downscale pages before OCR")
+    ocr.add_argument('--target-dpi', type=int, default=300,
+                     help="Resolution pages are downscaled to when preprocessing")
+    ocr.add_argument('--ocr-backend', choices=['auto', 'tesserocr', 'pytesseract'], default='auto',
+                     help="OCR engine: persistent in-process tesserocr, or a tesseract process per page")
+    add_telemetry_arguments(ocr)
+    ocr.set_defaults(handler='process_ocr_ai_with_resume:run')
+
+    correct = commands.add_parser('correct', help="Correct saved OCR text without running OCR again",
+                                  description="Correct pages whose OCR text is already saved in ocr_ai_results "
+                                              "(e.g. after a quota stop), without running OCR again")
+    add_engine_arguments(correct)
+    correct.add_argument('--redo', action='store_true',
+                         help="Also re-correct pages that were already processed")
+    add_telemetry_arguments(correct)
+    correct.set_defaults(handler='process_ocr_ai_with_resume:run_correct')
+
+    analyze = commands.add_parser('analyze', help="Embed, cluster and visualize the corrected texts",
+                                  description="Embed, cluster and visualize the corrected legal texts")
+    analyze.add_argument('--keep-chunks', action='store_true',
+                         help="Also store per-window vectors for passage-level search")
+    analyze.add_argument('--eps', type=float, default=0.5, help="DBSCAN neighbourhood radius (cosine distance)")
+    analyze.add_argument('--min-samples', type=int, default=2, help="DBSCAN core point neighbour count")
+    analyze.add_argument('--sweep', action='store_true',
+                         help="Print cluster counts and noise for a grid of settings instead of a full run")
+    analyze.add_argument('--eps-grid', type=float, nargs='+', default=[0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.4, 0.5])
+    analyze.add_argument('--min-samples-grid', type=int, nargs='+', default=[2, 3, 5, 10])
+    analyze.add_argument('--min-cluster-sizes', type=int, nargs='*', default=[2, 5, 10],
+                         help="HDBSCAN min_cluster_size values to include in the sweep")
+    analyze.add_argument('--save-embeddings', action='store_true',
+                         help="Include the document embeddings in the results bundle")
+    analyze.add_argument('--json', action='store_true', help="Also export the results as clustering_results.json")
+    analyze.add_argument('--viz', choices=['webgl', 'svg'], default='webgl',
+                         help="One WebGL page with drill-down, or the original two SVG scatter pages")
+    analyze.add_argument('--max-points', type=int, default=None,
+                         help="Points drawn in the WebGL overview; dense regions are thinned (default 20000)")
+    analyze.add_argument('--plotlyjs-cdn', action='store_true',
+                         help="Load plotly.js from its CDN instead of embedding it in the HTML")
+    analyze.add_argument('--refit-umap', action='store_true', help="Refit the UMAP projection from scratch")
+    analyze.add_argument('--drift-threshold', type=float, default=0.2,
+                         help="Refit UMAP once this fraction of documents was placed without refitting")
+    analyze.set_defaults(handler='analyze_legal_codes:run')
+
+    status = commands.add_parser('status', help="Show how far each stage has got",
+                                 description="Show source, page, OCR, correction and analysis progress")
+    status.add_argument('--json', action='store_true', help="Print the status as JSON")
+    status.set_defaults(handler='status:run')
+    return parser
+
+
+def configure_logging(level):
+    level = getattr(logging, level.upper())
+    debug = level == logging.DEBUG
+    logging.basicConfig(level=level,
+                        format="%(asctime)s %(name)s %(levelname)s: %(message)s" if debug else "%(message)s")
+    for name in NOISY_LOGGERS:
+        logging.getLogger(name).setLevel(logging.INFO if debug else max(level, logging.WARNING))
+
+
+def main(argv=None):
+    """Parse the command line and run the command, importing its module only now"""
+    args = build_parser().parse_args(argv)
+    configure_logging(args.log_level)
+    module_name, function_name = args.handler.split(':')
+    handler = getattr(importlib.import_module(module_name), function_name)
+    handler(args)
@@ -0,0 +1,68 @@
+import re
+
+# Characters that are almost always OCR confusions when they appear inside an otherwise alphabetic word
+DIGIT_TO_LETTER = str.maketrans({'0': 'o', '1': 'l', '5': 's'})
+INNER_DIGITS = re.compile(r'(?<=[A-Za-z])[015]+(?=[A-Za-z])')
+ORDINAL = re.compile(r'^\d+(st|nd|rd|th)$', re.IGNORECASE)
+
+LIGATURES = {
+    'ſ': 's',   # long s
+    'ﬁ': 'fi',
+    'ﬂ': 'fl',
+    'ﬀ': 'ff',
+    'ﬃ': 'ffi',
+    'ﬄ': 'ffl',
+    '‘': "'",
+    '’': "'",
+    '“': '"',
+    '”': '"',
+}
+
+
+def fix_word(word):
+    """Fix digit/letter confusions in a token that is mostly letters, e.g. 'sha1l' -> 'shall'.
+
+    Only digits with letters on both sides are swapped, so ordinals ('1st',
+    '5th') and section numbers with letter suffixes ('30A') are left alone.
+    """
+    letters = sum(ch.isalpha() for ch in word)
+    digits = sum(ch.isdigit() for ch in word)
+    if not digits or letters < 2 or letters <= digits or ORDINAL.match(word):
+        return word
+    fixed = INNER_DIGITS.sub(lambda match: match.group().translate(DIGIT_TO_LETTER), word)
+    # Keep all-caps headings in caps
+    return fixed.upper() if word.upper() == word else fixed
+
+
+def correct_paragraph(paragraph):
+    """Apply the local correction rules to one paragraph"""
+    # Re-join words hyphenated across line breaks, then unwrap the remaining lines
+    paragraph = re.sub(r'(\w)-\s*\n\s*(\w)', r'\1\2', paragraph)
+    paragraph = re.sub(r'\s*\n\s*', ' ', paragraph)
+
+    # Stray rule marks and pipes that Tesseract reads from column lines and borders
+    paragraph = re.sub(r'(^|\s)[|¦_~]+(?=\s|$)', r'\1', paragraph)
+
+    paragraph = re.sub(r'[A-Za-z0-9]+', lambda match: fix_word(match.group()), paragraph)
+
+    # Spacing around punctuation
+    paragraph = re.sub(r'\s+([,.;:!?)\]])', r'\1', paragraph)
+    paragraph = re.sub(r'([(\[])\s+', r'\1', paragraph)
+    paragraph = re.sub(r'([,;:])(?=[A-Za-z])', r'\1 ', paragraph)
+    paragraph = re.sub(r'\s{2,}', ' ', paragraph)
+    return paragraph.strip()
+
+
+def local_correct(text):
+    """Cheap rule-based correction for pages Tesseract read with high confidence.
+
+    Handles the mechanical fixes the OpenAI prompt asks for (ligatures and long
+    s, digit/letter confusions inside words, hyphenation and line wrapping,
+    punctuation spacing) without changing wording, so it is only used on pages
+    whose words are already reliable.
+    """
+    for ligature, replacement in LIGATURES.items():
+        text = text.replace(ligature, replacement)
+
+    paragraphs = [correct_paragraph(paragraph) for paragraph in re.split(r'\n\s*\n', text)]
+    return "\n\n".join(paragraph for paragraph in paragraphs if paragraph)
@@ -0,0 +1,100 @@
+import json
+import time
+import random
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockChatHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible /v1/chat/completions endpoint for local testing.
+
+    Echoes back the text after "Original text:" as the "corrected" text, after an
+    optional delay, and can answer a fraction of requests with 429 + Retry-After.
+    """
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    error_rate = 0.0
+    retry_after = 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_json(404, {'error': {'message': f"Unknown path {self.path}"}})
+            return
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if random.random() < self.error_rate:
+            self.send_json(429, {'error': {'message': 'Rate limit reached (mock)', 'type': 'requests',
+                                           'code': 'rate_limit_exceeded'}},
+                           headers={'Retry-After': str(self.retry_after)})
+            return
+
+        user_content = request['messages'][-1]['content']
+        text = user_content.split("Original text:\n", 1)[-1]
+        prompt_tokens = sum(len(m['content'].split()) for m in request['messages'])
+        completion_tokens = min(len(text.split()), request.get('max_tokens') or 4000)
+
+        self.send_json(200, {
+            'id': f"chatcmpl-mock-{time.time_ns()}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'gpt-4'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': text},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        })
+
+
+def create_server(host="127.0.0.1", port=8000, latency=0.0, error_rate=0.0, retry_after=1):
+    """Create (but don't start) a mock server; use port=0 to pick a free port"""
+    handler = type('ConfiguredMockChatHandler', (MockChatHandler,), {
+        'latency': latency,
+        'error_rate': error_rate,
+        'retry_after': retry_after
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock OpenAI chat-completions server")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds to wait before each response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.latency, args.error_rate, args.retry_after)
+    print(f"Mock OpenAI server listening on http://{args.host}:{server.server_address[1]}/v1")
+    print(f"Set OPENAI_BASE_URL=http://{args.host}:{server.server_address[1]}/v1 to use it")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
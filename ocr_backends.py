@@ -0,0 +1,141 @@
+import os
+import re
+import glob
+import time
+import random
+import argparse
+import pytesseract
+from PIL import Image
+from ocr_cache import TESSERACT_LANG, TESSERACT_CONFIG
+
+# One backend per process; Tesseract engines are not thread-safe
+_backend = None
+
+
+class PytesseractBackend:
+    """Runs the tesseract executable per page (writes a temp image, reloads the model every call)"""
+    name = 'pytesseract'
+
+    def __init__(self, lang=TESSERACT_LANG, config=TESSERACT_CONFIG):
+        self.lang = lang
+        self.config = config
+
+    def image_to_data(self, image):
+        return pytesseract.image_to_data(image, lang=self.lang, config=self.config,
+                                         output_type=pytesseract.Output.DICT)
+
+
+class TesserocrBackend:
+    """Persistent in-process Tesseract via tesserocr.
+
+    The language model is loaded once when the backend is created and each page
+    is handed over as an in-memory PIL image, so there is no process spawn or
+    temp file per page.
+    """
+    name = 'tesserocr'
+
+    def __init__(self, lang=TESSERACT_LANG, config=TESSERACT_CONFIG):
+        import tesserocr
+        self.tesserocr = tesserocr
+        match = re.search(r'--psm\s+(\d+)', config)
+        psm = int(match.group(1)) if match else tesserocr.PSM.AUTO
+        self.api = tesserocr.PyTessBaseAPI(lang=lang, psm=psm)
+
+    def image_to_data(self, image):
+        """Same word-level layout as pytesseract's image_to_data(output_type=DICT)"""
+        RIL = self.tesserocr.RIL
+        self.api.SetImage(image)
+        self.api.Recognize()
+
+        data = {'text': [], 'conf': [], 'page_num': [], 'block_num': [], 'par_num': [], 'line_num': []}
+        block_num = par_num = line_num = 0
+        for word in self.tesserocr.iterate_level(self.api.GetIterator(), RIL.WORD):
+            if word.IsAtBeginningOf(RIL.BLOCK):
+                block_num += 1
+                par_num = line_num = 0
+            if word.IsAtBeginningOf(RIL.PARA):
+                par_num += 1
+                line_num = 0
+            if word.IsAtBeginningOf(RIL.TEXTLINE):
+                line_num += 1
+            data['text'].append(word.GetUTF8Text(RIL.WORD) or '')
+            data['conf'].append(word.Confidence(RIL.WORD))
+            data['page_num'].append(1)
+            data['block_num'].append(block_num)
+            data['par_num'].append(par_num)
+            data['line_num'].append(line_num)
+        return data
+
+
+BACKENDS = {
+    'tesserocr': TesserocrBackend,
+    'pytesseract': PytesseractBackend,
+}
+
+
+def create_backend(name='auto'):
+    """Create an OCR backend; 'auto' prefers tesserocr and falls back to pytesseract"""
+    if name != 'auto':
+        return BACKENDS[name]()
+    try:
+        return TesserocrBackend()
+    except ImportError:
+        return PytesseractBackend()
+
+
+def get_backend(name='auto'):
+    """Return this process's OCR backend, creating it on first use"""
+    global _backend
+    if _backend is None:
+        _backend = create_backend(name)
+    return _backend
+
+
+def benchmark(pages=10, repeats=1, seed=42):
+    """Compare per-page OCR latency of the available backends on sample page images"""
+    image_paths = sorted(glob.glob(os.path.join("divorce_codes_jpg", "*_divorce_codes_jpg", "*.jp*g")))
+    if not image_paths:
+        print("No page images found in divorce_codes_jpg!")
+        return
+    random.Random(seed).shuffle(image_paths)
+    images = []
+    for image_path in image_paths[:pages]:
+        image = Image.open(image_path)
+        image.load()
+        images.append(image)
+
+    for name, backend_class in BACKENDS.items():
+        try:
+            start = time.perf_counter()
+            backend = backend_class()
+            load_time = time.perf_counter() - start
+        except ImportError:
+            print(f"{name}: not installed")
+            continue
+
+        latencies = []
+        for _ in range(repeats):
+            for image in images:
+                start = time.perf_counter()
+                backend.image_to_data(image)
+                latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        mean = sum(latencies) / len(latencies)
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{name}: load {load_time * 1000:.0f} ms, per page mean {mean * 1000:.0f} ms, "
+              f"p50 {p50 * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms over {len(latencies)} pages")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR backend micro-benchmark")
+    parser.add_argument('--pages', type=int, default=10, help="Number of sample pages")
+    parser.add_argument('--repeats', type=int, default=1, help="Times to OCR each page")
+    args = parser.parse_args()
+
+    # Match the OCR workers: one Tesseract thread per process
+    os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+    benchmark(args.pages, args.repeats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import json
+import time
+import sqlite3
+import hashlib
+import pytesseract
+
+# Tesseract settings used for every page; they are part of the cache key
+TESSERACT_LANG = 'eng'
+TESSERACT_CONFIG = '--psm 3'
+
+
+def file_digest(path, block_size=1024 * 1024):
+    """SHA-256 of a file, read in blocks so large PDFs aren't loaded whole"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class OCRCache:
+    """Persistent OCR result cache keyed by image content and Tesseract settings.
+
+    Keys are a SHA-256 of the image bytes plus the Tesseract version, language
+    and config, so a byte-identical page is OCR'd once no matter where it lives
+    in the tree or what it is called. Values are the OCR result dicts (text plus
+    confidences) from run_tesseract. Entries are kept in SQLite; once the stored
+    results exceed max_bytes the least recently used entries are evicted.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, lang=TESSERACT_LANG, config=TESSERACT_CONFIG, variant=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        try:
+            version = str(pytesseract.get_tesseract_version())
+        except Exception:
+            version = 'unknown'
+        self.settings = f"tesseract={version}|lang={lang}|config={config}|output=data"
+        if variant:
+            # Anything else that changes the OCR output, e.g. image preprocessing options
+            self.settings += f"|{variant}"
+        self.hits = 0
+        self.misses = 0
+
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_results ("
+            "key TEXT PRIMARY KEY, result TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS ocr_results_last_used ON ocr_results (last_used)")
+        self.db.commit()
+
+    def key_for_bytes(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        return hashlib.sha256(f"{digest}|{self.settings}".encode('utf-8')).hexdigest()
+
+    def key_for_file(self, image_path):
+        """Cache key for an image file on disk"""
+        with open(image_path, 'rb') as f:
+            return self.key_for_bytes(f.read())
+
+    def key_for_pdf_page(self, pdf_digest, page_number, render_settings):
+        """Cache key for a page OCR'd straight from a PDF, known before the page is rasterized.
+
+        pdf_digest is file_digest() of the PDF; render_settings describes how
+        the page is rendered (resolution, colour mode).
+        """
+        return self.key_for_bytes(f"pdf={pdf_digest}|page={page_number}|{render_settings}".encode('utf-8'))
+
+    def key_for_image(self, image):
+        """Cache key for an in-memory PIL image (e.g. a freshly rendered PDF page)"""
+        header = f"{image.mode}|{image.size[0]}x{image.size[1]}|".encode('utf-8')
+        return self.key_for_bytes(header + image.tobytes())
+
+    def get(self, key):
+        """Return the cached OCR result for key, or None"""
+        row = self.db.execute("SELECT result FROM ocr_results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.db.execute("UPDATE ocr_results SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.db.commit()
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        payload = json.dumps(result)
+        self.db.execute(
+            "INSERT OR REPLACE INTO ocr_results (key, result, size, last_used) VALUES (?, ?, ?, ?)",
+            (key, payload, len(payload), time.time())
+        )
+        self.evict()
+        self.db.commit()
+
+    def total_bytes(self):
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_results").fetchone()[0]
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        excess = self.total_bytes() - self.max_bytes
+        if excess <= 0:
+            return
+        freed = 0
+        stale = []
+        for key, size in self.db.execute("SELECT key, size FROM ocr_results ORDER BY last_used"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self.db.executemany("DELETE FROM ocr_results WHERE key = ?", stale)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': self.db.execute("SELECT COUNT(*) FROM ocr_results").fetchone()[0],
+            'bytes': self.total_bytes()
+        }
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,401 @@
+import os
+import time
+import asyncio
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pdf2image import pdfinfo_from_path
+from dotenv import load_dotenv
+from correction_engine import CorrectionEngine
+from convert_pdfs import get_page_filename, render_pages, extract_page_text, has_usable_text
+from ocr_cache import file_digest
+from embedding_store import EmbeddingStore
+from process_ocr_ai_with_resume import OCRProcessor, init_ocr_worker, run_tesseract
+from telemetry import current_page, profiled
+
+# Load environment variables
+load_dotenv()
+
+SOURCE_DIRS = ["al_divorce_codes", "nc_divorce_codes", "tn_divorce_codes"]
+JPG_DIR = "divorce_codes_jpg"
+# Lossless grayscale copies of rendered pages, written when archiving is enabled
+ARCHIVE_DIR = "divorce_codes_png"
+
+# Marks the end of a queue; each worker puts it back for its siblings before exiting
+DONE = object()
+
+
+class StageStats:
+    """Item counts and timing for one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.started = None
+        self.finished = None
+
+    def record(self, seconds, items=1):
+        if self.started is None:
+            self.started = time.monotonic() - seconds
+        self.items += items
+        self.busy_seconds += seconds
+
+    def throughput(self):
+        if self.started is None:
+            return 0.0
+        elapsed = (self.finished or time.monotonic()) - self.started
+        return self.items / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        return f"{self.name}: {self.items} pages, {self.throughput():.2f} pages/s, {self.busy_seconds:.1f}s busy"
+
+
+def page_key(state, name, page_number, page_count):
+    """Image path convert_pdfs.py would write for a page; used as the resume key"""
+    filename = get_page_filename(name, page_number, page_count)
+    return os.path.join(JPG_DIR, f"{state}_divorce_codes_jpg", filename)
+
+
+def find_sources():
+    """List (state, path) for every source PDF and page image"""
+    sources = []
+    for state_dir in SOURCE_DIRS:
+        if not os.path.exists(state_dir):
+            continue
+        state = state_dir[:2]
+        for file in sorted(os.listdir(state_dir)):
+            if file.lower().endswith(('.pdf', '.jpg', '.jpeg')):
+                sources.append((state, os.path.join(state_dir, file)))
+    return sources
+
+
+# Per worker process: writes archive copies in the background while the worker OCRs the next page
+_archive_writer = None
+
+
+def render_page(pdf_path, page_number, dpi=200, grayscale=True):
+    """Render a single PDF page to a PIL image"""
+    return render_pages(pdf_path, page_number, page_number, dpi=dpi, grayscale=grayscale)[0]
+
+
+def save_archive_copy(image, archive_path):
+    """Write a page as lossless PNG, via a temporary name so readers never see a partial file"""
+    temp_path = archive_path + ".part"
+    image.save(temp_path, 'PNG')
+    os.replace(temp_path, archive_path)
+
+
+def render_and_ocr(pdf_path, page_number, dpi=200, preprocess=None, archive_path=None):
+    """Render a PDF page and OCR it in the same (worker) process.
+
+    The raster only ever exists in this process's memory: it is not encoded to
+    JPEG, written to disk or pickled back to the parent, which gets just the OCR
+    result. With archive_path, a lossless grayscale PNG of the page is saved by a
+    background thread so the encode doesn't delay the OCR.
+    """
+    global _archive_writer
+    start = time.time()
+    image = render_page(pdf_path, page_number, dpi=dpi, grayscale=True)
+    rendered = time.time()
+    if archive_path is not None:
+        if _archive_writer is None:
+            _archive_writer = ThreadPoolExecutor(max_workers=1)
+        _archive_writer.submit(save_archive_copy, image, archive_path)
+    result = run_tesseract(image, preprocess=preprocess)
+    result['timings'].insert(0, ('ocr.render', start, rendered))
+    return result
+
+
+class Pipeline:
+    """Render -> OCR -> correct -> embed, with stages connected by bounded queues.
+
+    Pages flow through one at a time, so the first corrected pages are written
+    within seconds and memory is bounded by the queue sizes rather than the
+    corpus size. Results go to the same ocr_ai_results/<state>_results layout and
+    resume state as process_ocr_ai_with_resume.py, keyed by the image path
+    convert_pdfs.py would have produced, so both tools resume each other's work.
+    """
+
+    def __init__(self, processor, ocr_workers=2, correct_workers=8, queue_size=4,
+                 embed=False, embed_batch_size=32, report_interval=10, use_text_layer=True,
+                 dpi=200, archive=False):
+        self.processor = processor
+        self.use_text_layer = use_text_layer
+        self.dpi = dpi
+        self.archive = archive
+        # Part of the OCR cache key for pages rendered from PDFs
+        self.render_settings = f"dpi={dpi}|gray"
+        self.ocr_workers = ocr_workers
+        self.correct_workers = correct_workers
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size
+        self.report_interval = report_interval
+        self.embedder = EmbeddingStore(processor.output_dir) if embed else None
+        # 'render' is PDF rasterization, timed inside the OCR workers and left out of 'ocr'
+        stages = ['text_layer', 'render', 'ocr', 'correct'] + (['embed'] if embed else [])
+        self.stats = {name: StageStats(name) for name in stages}
+        self.stopped = False
+        self.tasks = []
+
+    def stop(self):
+        """Abandon the run, e.g. when the API quota is exhausted"""
+        self.stopped = True
+        for task in self.tasks:
+            if task is not asyncio.current_task():
+                task.cancel()
+
+    async def render_stage(self, sources, out_queue, text_queue):
+        """Queue one page at a time for OCR; blocks when the OCR queue is full.
+
+        PDF pages are queued as (pdf, page number) and rendered by the OCR
+        worker that handles them, so rasters never cross a process boundary.
+        Pages with a usable embedded text layer skip rendering and OCR and go
+        straight to text_queue (the correction stage).
+        """
+        for state, path in sources:
+            if self.stopped:
+                break
+            name = os.path.splitext(os.path.basename(path))[0]
+
+            if not path.lower().endswith('.pdf'):
+                # Page images go straight to OCR by path
+                key = os.path.join(JPG_DIR, f"{state}_divorce_codes_jpg", os.path.basename(path))
+                if key not in self.processor.processed_files:
+                    await out_queue.put((key, path, None, None))
+                continue
+
+            try:
+                info = await asyncio.get_running_loop().run_in_executor(None, pdfinfo_from_path, path)
+                pdf_digest = await asyncio.get_running_loop().run_in_executor(None, file_digest, path)
+            except Exception as e:
+                print(f"Error reading {path}: {str(e)}")
+                continue
+            page_count = info['Pages']
+            for page_number in range(1, page_count + 1):
+                if self.stopped:
+                    break
+                key = page_key(state, name, page_number, page_count)
+                # convert_pdfs.py saves text-layer pages as .txt, so they are keyed that way too
+                text_key = os.path.splitext(key)[0] + ".txt"
+                if key in self.processor.processed_files or text_key in self.processor.processed_files:
+                    continue
+
+                if self.use_text_layer:
+                    start = time.monotonic()
+                    with self.processor.tracer.span('text_layer', page=text_key) as span:
+                        text = await asyncio.get_running_loop().run_in_executor(None, extract_page_text, path, page_number)
+                        span.update(bytes_out=len(text.encode('utf-8')), usable=has_usable_text(text))
+                    if span['usable']:
+                        self.stats['text_layer'].record(time.monotonic() - start)
+                        await text_queue.put((text_key, text, 'text_layer', None))
+                        continue
+
+                await out_queue.put((key, path, page_number, pdf_digest))
+        await out_queue.put(DONE)
+
+    async def ocr_worker(self, executor, in_queue, out_queue):
+        while True:
+            item = await in_queue.get()
+            if item is DONE:
+                await in_queue.put(DONE)
+                return
+            key, path, page_number, pdf_digest = item
+            current_page.set(key)
+            start = time.monotonic()
+            steps = {}
+            try:
+                if page_number is None:
+                    ocr_result = await self.processor.run_ocr(path, executor)
+                else:
+                    ocr_result = await self.ocr_pdf_page(key, path, page_number, pdf_digest, executor, steps)
+            except Exception as e:
+                print(f"Error performing OCR on {key}: {str(e)}")
+                continue
+            # Cached pages were neither rendered nor OCR'd again, so only count real renders
+            render_seconds = steps.get('ocr.render')
+            if render_seconds is not None:
+                self.stats['render'].record(render_seconds)
+            self.stats['ocr'].record(max(0.0, time.monotonic() - start - (render_seconds or 0.0)))
+            await out_queue.put((key, ocr_result['text'], 'ocr', ocr_result['paragraphs']))
+
+    async def ocr_pdf_page(self, key, pdf_path, page_number, pdf_digest, executor, steps=None):
+        """Render and OCR a PDF page in a worker process, unless its OCR result is already cached.
+
+        steps, if given, collects the seconds the worker spent in each step
+        ('ocr.render', 'ocr.tesseract', ...).
+        """
+        cache_key = self.processor.ocr_cache.key_for_pdf_page(pdf_digest, page_number, self.render_settings)
+        archive_path = None
+        if self.archive:
+            archive_path = os.path.join(ARCHIVE_DIR, os.path.basename(os.path.dirname(key)).replace('_jpg', '_png'),
+                                        os.path.splitext(os.path.basename(key))[0] + ".png")
+            os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+        job = partial(render_and_ocr, pdf_path, page_number, dpi=self.dpi,
+                      preprocess=self.processor.preprocess, archive_path=archive_path)
+        return await self.processor.run_cached_ocr(cache_key, job, executor, steps=steps)
+
+    async def correct_worker(self, in_queue, out_queue):
+        while True:
+            item = await in_queue.get()
+            if item is DONE:
+                await in_queue.put(DONE)
+                return
+            key, ocr_text, source, paragraphs = item
+            start = time.monotonic()
+            result = await self.processor.correct_ocr_text(key, ocr_text, source, paragraphs)
+            if result is None:  # Quota exhausted or out of retries
+                self.stop()
+                return
+            self.stats['correct'].record(time.monotonic() - start)
+            print(f"Corrected: {key}")
+            if out_queue is not None:
+                await out_queue.put(key)
+
+    async def embed_stage(self, in_queue):
+        finished = False
+        while not finished:
+            batch = [await in_queue.get()]
+            while len(batch) < self.embed_batch_size and not in_queue.empty():
+                batch.append(in_queue.get_nowait())
+            if DONE in batch:
+                batch.remove(DONE)
+                finished = True
+            if not batch:
+                continue
+
+            texts = []
+            for key in batch:
+                with open(self.processor.get_output_path(key, "corrected"), 'r', encoding='utf-8') as f:
+                    texts.append(f.read())
+
+            # Same store analyze_legal_codes.py reads, so these pages aren't encoded again there
+            start = time.monotonic()
+            with self.processor.tracer.span('embed', pages=len(batch),
+                                            bytes_in=sum(len(text.encode('utf-8')) for text in texts)):
+                await asyncio.get_running_loop().run_in_executor(None, self.embedder.add, texts)
+            self.stats['embed'].record(time.monotonic() - start, len(batch))
+
+    async def report(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            print("\n[pipeline] " + " | ".join(s.summary() for s in self.stats.values()))
+
+    async def run(self, sources):
+        ocr_queue = asyncio.Queue(self.queue_size)
+        correct_queue = asyncio.Queue(self.queue_size)
+        embed_queue = asyncio.Queue(self.embed_batch_size * 2) if self.embedder else None
+
+        executor = ProcessPoolExecutor(max_workers=self.ocr_workers, initializer=init_ocr_worker,
+                                       initargs=(self.processor.ocr_backend,))
+        reporter = asyncio.create_task(self.report())
+        try:
+            render = asyncio.create_task(self.render_stage(sources, ocr_queue, correct_queue))
+            ocr = [asyncio.create_task(self.ocr_worker(executor, ocr_queue, correct_queue))
+                   for _ in range(self.ocr_workers)]
+            correct = [asyncio.create_task(self.correct_worker(correct_queue, embed_queue))
+                       for _ in range(self.correct_workers)]
+            embed = asyncio.create_task(self.embed_stage(embed_queue)) if self.embedder else None
+            self.tasks = [render] + ocr + correct + ([embed] if embed else [])
+
+            # Shut stages down in order so every queued page is drained
+            await render
+            await asyncio.gather(*ocr)
+            self.stats['render'].finished = self.stats['ocr'].finished = time.monotonic()
+            await correct_queue.put(DONE)
+            await asyncio.gather(*correct)
+            self.stats['correct'].finished = time.monotonic()
+            if embed is not None:
+                await embed_queue.put(DONE)
+                await embed
+                self.stats['embed'].finished = time.monotonic()
+        except asyncio.CancelledError:
+            if not self.stopped:
+                raise
+            print("\nStopping pipeline: OpenAI correction failed (see errors above)")
+        finally:
+            reporter.cancel()
+            for task in self.tasks:
+                task.cancel()
+            executor.shutdown(wait=True, cancel_futures=True)
+            await self.processor.engine.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream source PDFs/images through render, OCR, correction and embedding")
+    parser.add_argument('--ocr-workers', type=int, default=os.cpu_count() or 1,
+                        help="Number of parallel Tesseract processes")
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help="Maximum OpenAI requests in flight")
+    parser.add_argument('--rpm', type=int, default=int(os.getenv('OPENAI_RPM', 500)),
+                        help="OpenAI requests-per-minute limit")
+    parser.add_argument('--tpm', type=int, default=int(os.getenv('OPENAI_TPM', 40000)),
+                        help="OpenAI tokens-per-minute limit")
+    parser.add_argument('--confidence-threshold', type=float, default=85,
+                        help="Tesseract confidence below which text is sent to OpenAI (above 100 sends every page)")
+    parser.add_argument('--preprocess', action='store_true',
+                        help="Grayscale, binarize, deskew, crop and downscale pages before OCR")
+    parser.add_argument('--target-dpi', type=int, default=300,
+                        help="Resolution pages are downscaled to when preprocessing")
+    parser.add_argument('--ocr-backend', choices=['auto', 'tesserocr', 'pytesseract'], default='auto',
+                        help="OCR engine: persistent in-process tesserocr, or a tesseract process per page")
+    parser.add_argument('--queue-size', type=int, default=4,
+                        help="Pages buffered between stages (bounds memory use)")
+    parser.add_argument('--embed', action='store_true',
+                        help="Embed corrected pages with all-MiniLM-L6-v2 as they arrive")
+    parser.add_argument('--no-text-layer', action='store_true',
+                        help="Always render and OCR, even when a page has a usable embedded text layer")
+    parser.add_argument('--dpi', type=int, default=200, help="Resolution PDF pages are rendered at for OCR")
+    parser.add_argument('--archive', action='store_true',
+                        help=f"Also save rendered pages as lossless grayscale PNGs under {ARCHIVE_DIR}")
+    parser.add_argument('--report-interval', type=float, default=10,
+                        help="Seconds between per-stage throughput reports")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="Write the run's stage spans as a Chrome trace-event file")
+    parser.add_argument('--prometheus', metavar='FILE',
+                        help="Write per-stage histograms and counters in the Prometheus text format")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="Run the pipeline under cProfile and save the stats to FILE")
+    args = parser.parse_args()
+
+    engine = CorrectionEngine(max_concurrency=args.concurrency,
+                              requests_per_minute=args.rpm,
+                              tokens_per_minute=args.tpm)
+    preprocess = {'target_dpi': args.target_dpi} if args.preprocess else None
+    processor = OCRProcessor(engine, confidence_threshold=args.confidence_threshold, preprocess=preprocess,
+                             ocr_backend=args.ocr_backend)
+    pipeline = Pipeline(processor,
+                        ocr_workers=max(1, args.ocr_workers),
+                        correct_workers=args.concurrency,
+                        queue_size=args.queue_size,
+                        embed=args.embed,
+                        report_interval=args.report_interval,
+                        use_text_layer=not args.no_text_layer,
+                        dpi=args.dpi,
+                        archive=args.archive)
+
+    sources = find_sources()
+    print(f"Found {len(sources)} source files")
+    with profiled(args.profile):
+        asyncio.run(pipeline.run(sources))
+
+    # Save final statistics
+    processor.save_processing_stats()
+    if args.trace:
+        processor.tracer.write_chrome_trace(args.trace)
+        print(f"Trace written to {args.trace}")
+    if args.prometheus:
+        processor.tracer.write_prometheus(args.prometheus)
+        print(f"Metrics written to {args.prometheus}")
+
+    # Print summary
+    print("\nPipeline Complete!")
+    for stats in pipeline.stats.values():
+        print(f"- {stats.summary()}")
+    print(f"Total Files Processed: {len(processor.processed_files)}")
+    print(f"Total Tokens Used: {processor.total_tokens:,}")
+    print(f"Total Estimated Cost: ${processor.total_cost:.2f}")
+    print(f"Results saved in: {processor.output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,121 @@
 import os
+import sys
 import json
 import time
+import asyncio
+import logging
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-import pytesseract
 from PIL import Image
-from openai import OpenAI
 from dotenv import load_dotenv
 from tqdm import tqdm
-import tiktoken
+from correction_engine import CorrectionEngine, QuotaExceededError
+from correction_cache import CorrectionCache
+from ocr_cache import OCRCache
+from ocr_backends import get_backend
+from state_store import StateStore
+from local_corrector import local_correct
+from telemetry import Tracer, current_page, profiled
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+logger = logging.getLogger(__name__)
 
-# Create a tiktoken encoding for token counting
-encoding = tiktoken.encoding_for_model("gpt-4")
+JPG_DIR = "divorce_codes_jpg"
+STATES = ['al', 'nc', 'tn']
+
+def init_ocr_worker(backend='auto'):
+    """Set up an OCR worker process: one Tesseract thread, and the OCR engine loaded once.
+
+    OMP_THREAD_LIMIT has to be set before the Tesseract library is loaded, so
+    that happens first; the backend then stays resident for every page the
+    worker handles.
+    """
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    get_backend(backend)
+
+def page_confidence(paragraphs):
+    """Word-weighted mean Tesseract confidence of a page (None if nothing was scored)"""
+    scored = [p for p in paragraphs if p['confidence'] is not None]
+    words = sum(p['words'] for p in scored)
+    if not words:
+        return None
+    return sum(p['confidence'] * p['words'] for p in scored) / words
+
+def build_ocr_result(data):
+    """Turn word-level image_to_data output (see ocr_backends) into page text plus per-paragraph word confidences"""
+    paragraphs = {}
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        if not word:
+            continue
+        paragraph = paragraphs.setdefault((data['page_num'][i], data['block_num'][i], data['par_num'][i]),
+                                          {'lines': {}, 'confidences': []})
+        paragraph['lines'].setdefault(data['line_num'][i], []).append(word)
+        confidence = float(data['conf'][i])
+        if confidence >= 0:
+            paragraph['confidences'].append(confidence)
+
+    result_paragraphs = []
+    for paragraph in paragraphs.values():
+        confidences = paragraph['confidences']
+        result_paragraphs.append({
+            'text': "\n".join(" ".join(words) for words in paragraph['lines'].values()),
+            'words': sum(len(words) for words in paragraph['lines'].values()),
+            'confidence': sum(confidences) / len(confidences) if confidences else None
+        })
+
+    return {
+        'text': "\n\n".join(p['text'] for p in result_paragraphs),
+        'confidence': page_confidence(result_paragraphs),
+        'paragraphs': result_paragraphs
+    }
+
+def run_tesseract(image, preprocess=None):
+    """Run Tesseract OCR on an image file path or an in-memory PIL image.
+
+    preprocess is None to OCR the image as-is, or a dict of preprocess_image
+    options ({} for the defaults). Returns a dict with the page 'text', its mean
+    word 'confidence' and the per-paragraph 'paragraphs' used for
+    confidence-based routing, plus 'timings': (step, start, end) wall-clock
+    times for each step and the 'pid' of the process that ran them, which
+    run_cached_ocr turns into spans.
+    """
+    timings = []
+    if isinstance(image, str):
+        start = time.time()
+        image = Image.open(image)
+        image.load()
+        timings.append(('ocr.decode', start, time.time()))
+    if preprocess is not None:
+        # Imported here so plain OCR runs don't need NumPy
+        from preprocess import preprocess_image
+        start = time.time()
+        image = preprocess_image(image, **preprocess)
+        timings.append(('ocr.preprocess', start, time.time()))
+    start = time.time()
+    result = build_ocr_result(get_backend().image_to_data(image))
+    timings.append(('ocr.tesseract', start, time.time()))
+    result['timings'] = timings
+    result['pid'] = os.getpid()
+    return result
 
 class OCRProcessor:
-    def __init__(self):
+    def __init__(self, engine=None, ocr_cache=None, correction_cache=None, confidence_threshold=85,
+                 preprocess=None, ocr_backend='auto', tracer=None):
+        self.engine = engine or CorrectionEngine()
+        # Per-page stage spans for this run; shared with the engine so API calls are traced too
+        self.tracer = tracer or Tracer()
+        if self.engine.tracer is None:
+            self.engine.tracer = self.tracer
+        # OCR engine each worker process loads once ('auto', 'tesserocr' or 'pytesseract')
+        self.ocr_backend = ocr_backend
+        # Options for preprocess_image, or None to OCR the raw scans
+        self.preprocess = preprocess
+        # Paragraphs Tesseract read below this mean word confidence are sent to OpenAI
+        self.confidence_threshold = confidence_threshold
         self.total_tokens = 0
         self.total_cost = 0
         self.processing_stats = []
@@ -31,151 +127,370 @@ class OCRProcessor:
             os.makedirs(self.output_dir)
             
         # Create subdirectories for each state
-        for state in ['al', 'nc', 'tn']:
+        for state in STATES:
             state_dir = os.path.join(self.output_dir, f"{state}_results")
             if not os.path.exists(state_dir):
                 os.makedirs(state_dir)
 
-        # Load progress if exists
+        # OCR results are cached by image content, so renamed or copied pages aren't OCR'd again
+        variant = f"preprocess={json.dumps(preprocess, sort_keys=True)}" if preprocess is not None else None
+        self.ocr_cache = ocr_cache or OCRCache(os.path.join(self.output_dir, "ocr_cache.sqlite"), variant=variant)
+        self.ocr_inflight = {}
+
+        # Identical correction requests (same text, prompts and model settings) are only paid for once
+        if self.engine.cache is None:
+            self.engine.cache = correction_cache or CorrectionCache(os.path.join(self.output_dir, "correction_cache.sqlite"))
+
+        # Load progress, importing the old progress.json the first time
         self.progress_file = os.path.join(self.output_dir, "progress.json")
-        if os.path.exists(self.progress_file):
-            with open(self.progress_file, 'r') as f:
-                progress_data = json.load(f)
-                self.processed_files = set(progress_data.get('processed_files', []))
-                self.total_tokens = progress_data.get('total_tokens', 0)
-                self.total_cost = progress_data.get('total_cost', 0)
-                self.processing_stats = progress_data.get('processing_stats', [])
-
-    def save_progress(self):
-        """Save current progress to a JSON file"""
-        progress_data = {
-            'processed_files': list(self.processed_files),
-            'total_tokens': self.total_tokens,
-            'total_cost': self.total_cost,
-            'processing_stats': self.processing_stats,
-            'last_update': datetime.now().isoformat()
-        }
-        
-        with open(self.progress_file, 'w') as f:
-            json.dump(progress_data, f, indent=2)
+        self.state = StateStore(os.path.join(self.output_dir, "progress.sqlite"))
+        if self.state.get_meta('imported_progress_json') is None and os.path.exists(self.progress_file):
+            self.state.import_progress_json(self.progress_file)
+        self.processed_files, self.total_tokens, self.total_cost, self.processing_stats = self.state.load()
+
+    def get_output_path(self, image_path, suffix):
+        """Build the results path for an image, e.g. nc_results/<page>_ocr.txt"""
+        # Extract state code from path
+        state_code = os.path.basename(os.path.dirname(image_path)).split('_')[0]
+        base_filename = os.path.splitext(os.path.basename(image_path))[0]
+        return os.path.join(self.output_dir, f"{state_code}_results", f"{base_filename}_{suffix}.txt")
 
-    def process_image(self, image_path):
+    async def process_image(self, image_path, ocr_executor=None):
         """Process a single image through OCR and AI correction"""
         if image_path in self.processed_files:
-            print(f"\nSkipping already processed file: {image_path}")
+            logger.debug("Skipping already processed file: %s", image_path)
             return True
+        current_page.set(image_path)
+
+        if image_path.endswith('.txt'):
+            # Embedded PDF text layer extracted by convert_pdfs.py; no OCR needed
+            with open(image_path, 'r', encoding='utf-8') as f:
+                ocr_text = f.read()
+            paragraphs = None
+            source = 'text_layer'
+        else:
+            try:
+                ocr_result = await self.run_ocr(image_path, ocr_executor)
+            except Exception as e:
+                print(f"Error performing OCR on {image_path}: {str(e)}")
+                return None
+            ocr_text = ocr_result['text']
+            paragraphs = ocr_result['paragraphs']
+            source = 'ocr'
+            logger.debug("OCR of %s: %d characters in %d paragraphs, confidence %s", image_path, len(ocr_text),
+                         len(paragraphs), page_confidence(paragraphs))
 
         print(f"\nProcessing: {image_path}")
-        
-        # Extract state code from path
-        state_code = os.path.basename(os.path.dirname(image_path)).split('_')[0]
-        
-        # Perform OCR
+        return await self.correct_ocr_text(image_path, ocr_text, source, paragraphs)
+
+    async def run_ocr(self, image, ocr_executor=None):
+        """OCR an image path or PIL image, reusing cached or in-flight results for identical content"""
+        if isinstance(image, str):
+            key = self.ocr_cache.key_for_file(image)
+            bytes_in = os.path.getsize(image)
+        else:
+            key = self.ocr_cache.key_for_image(image)
+            bytes_in = None
+
+        return await self.run_cached_ocr(key, partial(run_tesseract, image, preprocess=self.preprocess),
+                                         ocr_executor, bytes_in)
+
+    async def run_cached_ocr(self, key, job, ocr_executor=None, bytes_in=None, steps=None):
+        """Run an OCR job in the executor unless its result is cached or already in flight under key.
+
+        Records an 'ocr' span for the page, an 'ocr.queue' span for the wait
+        for a free worker, and one span per step the worker timed. If steps is
+        a dict, the seconds spent in each worker step are also added to it.
+        """
+        with self.tracer.span('ocr', bytes_in=bytes_in or 0) as span:
+            if key in self.ocr_inflight:
+                # The same page content is already being OCR'd; share its result
+                span['shared'] = True
+                ocr_result = await asyncio.shield(self.ocr_inflight[key])
+                span['bytes_out'] = len(ocr_result['text'].encode('utf-8'))
+                return ocr_result
+
+            cached_result = self.ocr_cache.get(key)
+            if cached_result is not None:
+                span['cached'] = True
+                span['bytes_out'] = len(cached_result['text'].encode('utf-8'))
+                return cached_result
+
+            # Perform OCR off the event loop
+            loop = asyncio.get_running_loop()
+            submitted = time.time()
+            future = loop.run_in_executor(ocr_executor, job)
+            self.ocr_inflight[key] = future
+            try:
+                ocr_result = await asyncio.shield(future)
+            finally:
+                del self.ocr_inflight[key]
+
+            # Worker timings describe this run only, so they are not cached
+            timings = ocr_result.pop('timings', [])
+            pid = ocr_result.pop('pid', None)
+            if timings:
+                self.tracer.add('ocr.queue', submitted, timings[0][1])
+            for step, start, end in timings:
+                self.tracer.add(step, start, end, pid=pid)
+                if steps is not None:
+                    steps[step] = steps.get(step, 0.0) + (end - start)
+            span['bytes_out'] = len(ocr_result['text'].encode('utf-8'))
+
+            self.ocr_cache.put(key, ocr_result)
+            return ocr_result
+
+    def choose_route(self, paragraphs):
+        """Pick how to correct a page from its OCR confidences.
+
+        'local' - every paragraph is above the threshold; rule-based fixes only
+        'mixed' - only the low-confidence paragraphs go to OpenAI
+        'llm'   - most of the page is low confidence (or unscored), send it all
+        """
+        if not paragraphs:
+            return 'llm'
+        total_words = sum(p['words'] for p in paragraphs)
+        low_words = sum(p['words'] for p in paragraphs
+                        if p['confidence'] is None or p['confidence'] < self.confidence_threshold)
+        if low_words == 0:
+            return 'local'
+        if low_words * 2 > total_words:
+            return 'llm'
+        return 'mixed'
+
+    async def correct_page(self, ocr_text, paragraphs=None):
+        """Correct a page along its confidence route; returns (text, route, OpenAI results)"""
+        route = self.choose_route(paragraphs)
+        if route == 'local':
+            return local_correct(ocr_text), route, []
+        if route == 'llm':
+            result = await self.correct_with_openai(ocr_text)
+            return result['text'], route, [result]
+
+        # Group consecutive low-confidence paragraphs into regions so each region keeps its context
+        regions = []
+        for paragraph in paragraphs:
+            low = paragraph['confidence'] is None or paragraph['confidence'] < self.confidence_threshold
+            if regions and regions[-1][0] == low:
+                regions[-1][1].append(paragraph['text'])
+            else:
+                regions.append((low, [paragraph['text']]))
+
+        escalated = [asyncio.ensure_future(self.correct_with_openai("\n\n".join(texts)))
+                     for low, texts in regions if low]
+        try:
+            results = await asyncio.gather(*escalated)
+        except BaseException:
+            for task in escalated:
+                task.cancel()
+            raise
+
+        pieces = []
+        remaining_results = iter(results)
+        for low, texts in regions:
+            if low:
+                pieces.append(next(remaining_results)['text'])
+            else:
+                pieces.append(local_correct("\n\n".join(texts)))
+        return "\n\n".join(pieces), route, results
+
+    async def correct_ocr_text(self, image_path, ocr_text, source='ocr', paragraphs=None):
+        """Save the OCR text for an image and correct it.
+
+        source records where the text came from ('ocr' or 'text_layer');
+        paragraphs carries Tesseract confidences used to choose between local
+        and OpenAI correction.
+        """
+        current_page.set(image_path)
+        ocr_bytes = ocr_text.encode('utf-8')
+
+        # Save original OCR text
+        ocr_filename = self.get_output_path(image_path, "ocr")
+        with self.tracer.span('write', file='ocr', bytes_out=len(ocr_bytes)):
+            with open(ocr_filename, 'w', encoding='utf-8') as f:
+                f.write(ocr_text)
+        logger.debug("OCR text saved to %s", ocr_filename)
+
+        # Correct locally or with OpenAI (rate limiting and retries are handled by the engine)
+        start = time.monotonic()
         try:
-            image = Image.open(image_path)
-            ocr_text = pytesseract.image_to_string(image)
+            with self.tracer.span('correct', source=source, bytes_in=len(ocr_bytes)) as span:
+                corrected_text, route, results = await self.correct_page(ocr_text, paragraphs)
+                span.update(route=route, retries=sum(result['retries'] for result in results),
+                            cached=bool(results) and all(result['cached'] for result in results),
+                            bytes_out=len(corrected_text.encode('utf-8')))
+        except QuotaExceededError:
+            print(f"\nError: OpenAI API quota exceeded. Please check your billing details.")
+            return None
         except Exception as e:
-            print(f"Error performing OCR on {image_path}: {str(e)}")
+            print(f"\nFailed to process {image_path}: {str(e)}")
             return None
+        self.record_stats(image_path, source, route, ocr_text, paragraphs, results, time.monotonic() - start)
+        logger.debug("Corrected %s via route '%s': %d OpenAI requests, %d retries, %.2fs", image_path, route,
+                     len(results), span['retries'], time.monotonic() - start)
 
-        # Save original OCR text
-        base_filename = os.path.splitext(os.path.basename(image_path))[0]
-        ocr_filename = os.path.join(self.output_dir, f"{state_code}_results", f"{base_filename}_ocr.txt")
-        with open(ocr_filename, 'w', encoding='utf-8') as f:
-            f.write(ocr_text)
+        # Save corrected text
+        corrected_filename = self.get_output_path(image_path, "corrected")
+        with self.tracer.span('write', file='corrected', bytes_out=span['bytes_out']):
+            with open(corrected_filename, 'w', encoding='utf-8') as f:
+                f.write(corrected_text)
+        logger.debug("Corrected text saved to %s", corrected_filename)
 
-        # Process with OpenAI with retry logic
-        max_retries = 5
-        retry_delay = 20  # seconds
-        
-        for attempt in range(max_retries):
-            try:
-                corrected_text = self.correct_with_openai(ocr_text)
-                
-                # Save corrected text
-                corrected_filename = os.path.join(self.output_dir, f"{state_code}_results", f"{base_filename}_corrected.txt")
-                with open(corrected_filename, 'w', encoding='utf-8') as f:
-                    f.write(corrected_text)
-                
-                # Mark file as processed
-                self.processed_files.add(image_path)
-                self.save_progress()
-                
-                return True
-                
-            except Exception as e:
-                if "insufficient_quota" in str(e):
-                    print(f"\nError: OpenAI API quota exceeded. Please check your billing details.")
-                    return None
-                elif attempt < max_retries - 1:
-                    wait_time = retry_delay * (attempt + 1)
-                    print(f"\nError processing with OpenAI (attempt {attempt + 1}/{max_retries}): {str(e)}")
-                    print(f"Waiting {wait_time} seconds before retrying...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"\nFailed to process after {max_retries} attempts: {str(e)}")
-                    return None
-
-    def correct_with_openai(self, text):
-        """Send text to OpenAI for correction"""
-        prompt = """Please correct this historical legal text. Fix OCR errors, punctuation, and formatting while preserving the original meaning and historical context. Rules:
-1. Fix obvious OCR errors (like '0' for 'O', '1' for 'l')
-2. Add appropriate punctuation and capitalization
-3. Fix spacing and line breaks
-4. Preserve original meaning and historical context
-5. Make best guesses for unclear words based on context
-6. Do not add or delete any content unless correcting clear errors
-7. Process the ENTIRE text - do not truncate or summarize
-
-Original text:
-"""
-
-        messages = [
-            {"role": "system", "content": "You are a historical document transcription expert specializing in legal texts."},
-            {"role": "user", "content": prompt + text}
-        ]
-
-        # Count tokens
-        prompt_tokens = len(encoding.encode(prompt + text))
-        
-        # Add delay to respect rate limits
-        time.sleep(3)  # Wait 3 seconds between API calls
-        
-        # Make API call
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=messages,
-            temperature=0.3,
-            max_tokens=4000
-        )
-        
-        # Update token counts and costs
-        completion_tokens = response.usage.completion_tokens
-        total_tokens = response.usage.total_tokens
-        
-        # Calculate cost (GPT-4 pricing: $0.03/1K prompt tokens, $0.06/1K completion tokens)
-        prompt_cost = (prompt_tokens / 1000) * 0.03
-        completion_cost = (completion_tokens / 1000) * 0.06
-        
+        # Mark file as processed
+        self.processed_files.add(image_path)
+        with self.tracer.span('state'):
+            self.state.mark_processed(image_path)
+
+        return True
+
+    async def process_images(self, image_files, workers=1):
+        """OCR images in a process pool and correct each page as soon as its OCR finishes"""
+        remaining_files = [f for f in image_files if f not in self.processed_files]
+
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_ocr_worker,
+                                       initargs=(self.ocr_backend,))
+        tasks = [asyncio.create_task(self.process_image(path, executor)) for path in remaining_files]
+
+        try:
+            with tqdm(total=len(tasks), desc=f"Processing Images ({workers} OCR workers)") as pbar:
+                for next_done in asyncio.as_completed(tasks):
+                    result = await next_done
+                    if result is None:  # If processing failed due to quota
+                        return None
+                    pbar.update(1)
+        finally:
+            # Drop any outstanding work if we stopped early
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            executor.shutdown(wait=True, cancel_futures=True)
+            await self.engine.close()
+
+        return True
+
+    def saved_ocr_pages(self, include_processed=False):
+        """Page keys whose OCR text is already saved in the results directory.
+
+        A page's key is its image (or text layer) path under divorce_codes_jpg,
+        as used for resume state; processed pages are left out unless
+        include_processed.
+        """
+        pages = []
+        for state in STATES:
+            results_dir = os.path.join(self.output_dir, f"{state}_results")
+            image_dir = os.path.join(JPG_DIR, f"{state}_divorce_codes_jpg")
+            for file in sorted(os.listdir(results_dir)):
+                if not file.endswith("_ocr.txt"):
+                    continue
+                base_filename = file[:-len("_ocr.txt")]
+                candidates = [os.path.join(image_dir, base_filename + ext) for ext in ('.jpg', '.jpeg', '.txt')]
+                key = next((c for c in candidates if c in self.processed_files or os.path.exists(c)), candidates[0])
+                if include_processed or key not in self.processed_files:
+                    pages.append(key)
+        return pages
+
+    async def correct_saved_page(self, image_path):
+        """Correct a page from its saved OCR text, without running OCR again.
+
+        Confidence routing uses the OCR cache's paragraphs when they match the
+        saved text; otherwise the whole page goes to OpenAI.
+        """
+        with open(self.get_output_path(image_path, "ocr"), 'r', encoding='utf-8') as f:
+            ocr_text = f.read()
+        source = 'text_layer' if image_path.endswith('.txt') else 'ocr'
+        paragraphs = None
+        if source == 'ocr' and os.path.exists(image_path):
+            cached_result = self.ocr_cache.get(self.ocr_cache.key_for_file(image_path))
+            if cached_result is not None and cached_result['text'] == ocr_text:
+                paragraphs = cached_result['paragraphs']
+        if paragraphs is None:
+            logger.debug("No cached OCR confidences for %s; routing the whole page to OpenAI", image_path)
+        return await self.correct_ocr_text(image_path, ocr_text, source, paragraphs)
+
+    async def correct_saved_pages(self, pages):
+        """Correct saved OCR text for pages concurrently (the `correct` command)"""
+        tasks = [asyncio.create_task(self.correct_saved_page(path)) for path in pages]
+        try:
+            with tqdm(total=len(tasks), desc="Correcting saved OCR text") as pbar:
+                for next_done in asyncio.as_completed(tasks):
+                    if await next_done is None:  # Quota exhausted or out of retries
+                        return None
+                    pbar.update(1)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.engine.close()
+        return True
+
+    async def correct_with_openai(self, text):
+        """Send text to OpenAI for correction; returns the engine result with token/cost stats"""
+        return await self.engine.correct(text)
+
+    def record_stats(self, image_path, source, route, ocr_text, paragraphs, results, latency):
+        """Update totals and store the processing stats entry for one page"""
+        # Cached corrections cost nothing
+        paid = [result for result in results if not result['cached']]
+        cost = sum(result['cost'] for result in paid)
+        total_tokens = sum(result['total_tokens'] for result in paid)
         self.total_tokens += total_tokens
-        self.total_cost += (prompt_cost + completion_cost)
-        
-        # Store processing stats
-        self.processing_stats.append({
-            'prompt_tokens': prompt_tokens,
-            'completion_tokens': completion_tokens,
-            'total_tokens': total_tokens,
-            'cost': prompt_cost + completion_cost
-        })
+        self.total_cost += cost
+
+        # What sending the whole page to OpenAI would have cost
+        estimated_savings = 0.0
+        if route != 'llm':
+            estimated_savings = max(0.0, self.engine.estimate_cost(ocr_text) - cost)
 
-        return response.choices[0].message.content
+        entry = {
+            'file': image_path,
+            'source': source,
+            'route': route,
+            'confidence': page_confidence(paragraphs) if paragraphs else None,
+            'latency': latency,
+            'prompt_tokens': sum(result['prompt_tokens'] for result in results),
+            'completion_tokens': sum(result['completion_tokens'] for result in results),
+            'total_tokens': sum(result['total_tokens'] for result in results),
+            'cost': cost,
+            'estimated_savings': estimated_savings,
+            'retries': sum(result['retries'] for result in results),
+            'cached': bool(results) and not paid
+        }
+        self.processing_stats.append(entry)
+        self.state.add_stats(entry, self.total_tokens, self.total_cost)
 
     def save_processing_stats(self):
         """Save processing statistics to a JSON file"""
+        pages_by_source = {}
+        routes = {}
+        for entry in self.processing_stats:
+            source = entry.get('source', 'ocr')
+            pages_by_source[source] = pages_by_source.get(source, 0) + 1
+
+            route = routes.setdefault(entry.get('route', 'llm'), {
+                'pages': 0, 'latency': 0.0, 'cost': 0.0, 'estimated_savings': 0.0
+            })
+            route['pages'] += 1
+            route['latency'] += entry.get('latency', 0.0)
+            route['cost'] += entry['cost']
+            route['estimated_savings'] += entry.get('estimated_savings', 0.0)
+        for route in routes.values():
+            route['avg_latency'] = route['latency'] / route['pages']
+
         stats = {
             'timestamp': datetime.now().isoformat(),
             'total_tokens': self.total_tokens,
             'total_cost': self.total_cost,
+            'pages_by_source': pages_by_source,
+            'routes': routes,
+            'ocr_cache': self.ocr_cache.stats(),
+            'correction_cache': self.engine.cache.stats(),
+            # This run's per-page spans, and per-stage totals and duration histograms over them
+            'run': {
+                'started': datetime.fromtimestamp(self.tracer.started).isoformat(),
+                'stages': self.tracer.summary(),
+                'histograms': self.tracer.histograms()
+            },
+            'spans': self.tracer.spans,
             'detailed_stats': self.processing_stats
         }
         
@@ -183,33 +498,36 @@ Original text:
         with open(stats_file, 'w') as f:
             json.dump(stats, f, indent=2)
 
-def main():
-    processor = OCRProcessor()
-    
-    # Get all image files from the jpg directories
+def find_page_files():
+    """Page images and text layers written by convert_pdfs.py"""
     image_files = []
-    base_dir = "divorce_codes_jpg"
-    
-    for state_dir in ['al_divorce_codes_jpg', 'nc_divorce_codes_jpg', 'tn_divorce_codes_jpg']:
-        dir_path = os.path.join(base_dir, state_dir)
+    for state in STATES:
+        dir_path = os.path.join(JPG_DIR, f"{state}_divorce_codes_jpg")
         if os.path.exists(dir_path):
             for file in os.listdir(dir_path):
-                if file.lower().endswith(('.jpg', '.jpeg')):
+                # .txt files are embedded text layers saved by convert_pdfs.py
+                if file.lower().endswith(('.jpg', '.jpeg', '.txt')):
                     image_files.append(os.path.join(dir_path, file))
+    return image_files
 
-    # Remove already processed files from the list
-    remaining_files = [f for f in image_files if f not in processor.processed_files]
-    
-    # Process all images with progress bar
-    with tqdm(total=len(remaining_files), desc="Processing Images") as pbar:
-        for image_path in remaining_files:
-            result = processor.process_image(image_path)
-            if result is None:  # If processing failed due to quota
-                break
-            pbar.update(1)
-
-    # Save final statistics
+def create_processor(args):
+    """OCRProcessor configured from the `ocr` / `correct` command-line options"""
+    engine = CorrectionEngine(max_concurrency=args.concurrency,
+                              requests_per_minute=args.rpm or int(os.getenv('OPENAI_RPM', 500)),
+                              tokens_per_minute=args.tpm or int(os.getenv('OPENAI_TPM', 40000)))
+    preprocess = {'target_dpi': args.target_dpi} if getattr(args, 'preprocess', False) else None
+    return OCRProcessor(engine, confidence_threshold=args.confidence_threshold, preprocess=preprocess,
+                        ocr_backend=getattr(args, 'ocr_backend', 'auto'))
+
+def finish(processor, args):
+    """Save statistics and exports and print the run summary"""
     processor.save_processing_stats()
+    if args.trace:
+        processor.tracer.write_chrome_trace(args.trace)
+        print(f"Trace written to {args.trace}")
+    if args.prometheus:
+        processor.tracer.write_prometheus(args.prometheus)
+        print(f"Metrics written to {args.prometheus}")
     
     # Print summary
     print("\nProcessing Complete!")
@@ -218,5 +536,32 @@ def main():
     print(f"Total Estimated Cost: ${processor.total_cost:.2f}")
     print(f"Results saved in: {processor.output_dir}")
 
+def run(args):
+    """The `ocr` command: OCR and correct every page not yet processed; args are parsed by legal_codes.cli"""
+    processor = create_processor(args)
+    image_files = find_page_files()
+
+    # Remove already processed files from the list
+    remaining_files = [f for f in image_files if f not in processor.processed_files]
+    logger.debug("Found %d page files, %d still to process", len(image_files), len(remaining_files))
+    
+    # OCR pages in parallel and correct them concurrently as they complete
+    with profiled(args.profile):
+        asyncio.run(processor.process_images(remaining_files, max(1, args.workers)))
+    finish(processor, args)
+
+def run_correct(args):
+    """The `correct` command: correct saved OCR text without running OCR again"""
+    processor = create_processor(args)
+    pages = processor.saved_ocr_pages(include_processed=args.redo)
+    print(f"Correcting {len(pages)} pages from saved OCR text")
+    with profiled(args.profile):
+        asyncio.run(processor.correct_saved_pages(pages))
+    finish(processor, args)
+
+def main():
+    from legal_codes.cli import main as cli_main
+    cli_main(['ocr', *sys.argv[1:]])
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,91 @@
+import os
+import re
+import time
+import joblib
+import numpy as np
+from embedding_store import DEFAULT_MODEL
+
+
+class ProjectionCache:
+    """2-D UMAP projection that is fitted once and reused across runs.
+
+    The fitted reducer is saved with joblib and the coordinates of every
+    projected document are saved by content hash, so:
+
+    - documents seen before keep their coordinates (no UMAP work at all, and
+      the reducer isn't even loaded)
+    - new or changed documents are placed with reducer.transform()
+    - the reducer is refitted on request, or once more than drift_threshold
+      of the corpus has been placed by transform rather than by the fit
+    """
+
+    def __init__(self, directory="ocr_ai_results", model_name=DEFAULT_MODEL, drift_threshold=0.2,
+                 random_state=42):
+        slug = re.sub(r'[^A-Za-z0-9.-]+', '_', model_name)
+        self.reducer_file = os.path.join(directory, f"umap_{slug}_reducer.joblib")
+        self.coordinates_file = os.path.join(directory, f"umap_{slug}_coordinates.npz")
+        self.drift_threshold = drift_threshold
+        self.random_state = random_state
+        self.reducer = None
+        self.coordinates = {}
+        # Hashes of the documents the reducer was fitted on
+        self.fitted = set()
+        self.load()
+
+    def load(self):
+        if not (os.path.exists(self.coordinates_file) and os.path.exists(self.reducer_file)):
+            return
+        data = np.load(self.coordinates_file)
+        self.coordinates = dict(zip(data['hashes'].tolist(), data['coordinates']))
+        self.fitted = set(data['hashes'][data['fitted']].tolist())
+
+    def save(self):
+        hashes = list(self.coordinates)
+        temp_file = self.coordinates_file + ".part.npz"
+        np.savez(temp_file,
+                 hashes=np.array(hashes),
+                 coordinates=np.array([self.coordinates[h] for h in hashes], dtype=np.float32).reshape(-1, 2),
+                 fitted=np.array([h in self.fitted for h in hashes], dtype=bool))
+        os.replace(temp_file, self.coordinates_file)
+
+    def load_reducer(self):
+        if self.reducer is None:
+            self.reducer = joblib.load(self.reducer_file)
+        return self.reducer
+
+    def drift(self, hashes):
+        """Fraction of the corpus that was not part of the last fit"""
+        if not hashes:
+            return 0.0
+        return sum(1 for h in set(hashes) if h not in self.fitted) / len(set(hashes))
+
+    def fit(self, hashes, embeddings):
+        # Imported here: umap pulls in numba, which is slow to load
+        from umap import UMAP
+        self.reducer = UMAP(n_components=2, random_state=self.random_state)
+        coordinates = self.reducer.fit_transform(embeddings)
+        joblib.dump(self.reducer, self.reducer_file + ".part")
+        os.replace(self.reducer_file + ".part", self.reducer_file)
+        self.coordinates = dict(zip(hashes, coordinates))
+        self.fitted = set(hashes)
+        self.save()
+
+    def project(self, hashes, embeddings, refit=False):
+        """2-D coordinates for documents (rows of embeddings, identified by content hash)"""
+        start = time.perf_counter()
+        drift = self.drift(hashes)
+        if refit or not self.fitted or drift > self.drift_threshold:
+            reason = "requested" if refit else ("no saved reducer" if not self.fitted else f"drift {drift:.0%}")
+            print(f"Fitting UMAP on {len(hashes)} documents ({reason})...")
+            self.fit(hashes, embeddings)
+        else:
+            new_rows = [i for i, h in enumerate(hashes) if h not in self.coordinates]
+            if new_rows:
+                new_coordinates = self.load_reducer().transform(np.asarray(embeddings)[new_rows])
+                for i, coordinates in zip(new_rows, new_coordinates):
+                    self.coordinates[hashes[i]] = coordinates
+                self.save()
+            print(f"Placed {len(new_rows)} new documents with the saved UMAP reducer "
+                  f"({len(hashes) - len(new_rows)} reused, drift {drift:.0%})")
+        print(f"Projection took {time.perf_counter() - start:.1f}s")
+        return np.array([self.coordinates[h] for h in hashes], dtype=np.float32).reshape(-1, 2)
@@ -0,0 +1,138 @@
+import os
+import json
+import argparse
+import numpy as np
+
+DEFAULT_BUNDLE = "clustering_results"
+
+
+class StringColumn:
+    """A string column stored as UTF-8 bytes plus offsets; values are decoded on access"""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def tolist(self):
+        return list(self)
+
+
+def save_array(path, array):
+    with open(path + ".part", 'wb') as f:
+        np.save(f, array)
+    os.replace(path + ".part", path)
+
+
+def write_results(directory, columns):
+    """Write named columns as .npy files, plus a manifest listing them.
+
+    Numeric columns are 1-D or 2-D arrays of equal length, one .npy each.
+    String columns (lists of str) are stored Arrow-style as concatenated UTF-8
+    bytes and an offsets array, which is far smaller than fixed-width numpy
+    unicode. Everything can be memory-mapped. Each file is written under a
+    temporary name and renamed, and the manifest goes last, so readers never
+    see a half-written bundle.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = {}
+    files = set()
+    for name, values in columns.items():
+        if isinstance(values, (list, tuple)) and all(isinstance(value, str) for value in values):
+            encoded = [value.encode('utf-8') for value in values]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(value) for value in encoded])
+            save_array(os.path.join(directory, f"{name}.utf8.npy"), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+            save_array(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+            files.update([f"{name}.utf8.npy", f"{name}.offsets.npy"])
+            manifest[name] = {'dtype': 'string', 'shape': [len(values)]}
+            continue
+        array = np.asarray(values)
+        save_array(os.path.join(directory, f"{name}.npy"), array)
+        files.add(f"{name}.npy")
+        manifest[name] = {'dtype': str(array.dtype), 'shape': list(array.shape)}
+
+    manifest_path = os.path.join(directory, "manifest.json")
+    with open(manifest_path + ".part", 'w') as f:
+        json.dump({'rows': len(next(iter(columns.values()))) if columns else 0, 'columns': manifest}, f, indent=2)
+    os.replace(manifest_path + ".part", manifest_path)
+
+    # Columns left over from an earlier run (e.g. embeddings) no longer belong to this bundle
+    for file in os.listdir(directory):
+        if file.endswith(".npy") and file not in files:
+            os.remove(os.path.join(directory, file))
+
+
+class ResultsBundle:
+    """Lazy reader for a results bundle: a column is memory-mapped the first time it is accessed"""
+
+    def __init__(self, directory=DEFAULT_BUNDLE):
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json"), 'r') as f:
+            manifest = json.load(f)
+        self.rows = manifest['rows']
+        self.schema = manifest['columns']
+        self._columns = {}
+
+    @property
+    def columns(self):
+        return list(self.schema)
+
+    def __contains__(self, name):
+        return name in self.schema
+
+    def __getitem__(self, name):
+        if name not in self.schema:
+            raise KeyError(name)
+        if name not in self._columns:
+            if self.schema[name]['dtype'] == 'string':
+                self._columns[name] = StringColumn(
+                    np.load(os.path.join(self.directory, f"{name}.utf8.npy"), mmap_mode='r'),
+                    np.load(os.path.join(self.directory, f"{name}.offsets.npy"), mmap_mode='r'))
+            else:
+                self._columns[name] = np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode='r')
+        return self._columns[name]
+
+    def __len__(self):
+        return self.rows
+
+    def metadata(self):
+        """Per-document metadata dicts in the clustering_results.json format"""
+        return [{'file': file, 'state': state, 'path': path}
+                for file, state, path in zip(self['file'], self['state'], self['path'])]
+
+    def export_json(self, path="clustering_results.json"):
+        """Write the bundle in the original clustering_results.json layout"""
+        results = {
+            'clusters': self['cluster'].tolist(),
+            'metadata': self.metadata(),
+            'coordinates': self['coordinates'].tolist()
+        }
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect a clustering results bundle")
+    parser.add_argument('bundle', nargs='?', default=DEFAULT_BUNDLE)
+    parser.add_argument('--export-json', metavar='PATH', help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    bundle = ResultsBundle(args.bundle)
+    print(f"{args.bundle}: {len(bundle)} documents")
+    for name, info in bundle.schema.items():
+        print(f"  {name:<12} {info['dtype']:<10} {tuple(info['shape'])}")
+    if args.export_json:
+        bundle.export_json(args.export_json)
+        print(f"Exported {args.export_json}")
+
+if __name__ == "__main__":
+    main()
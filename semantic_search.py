@@ -0,0 +1,232 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from embedding_store import EmbeddingStore, DEFAULT_MODEL, content_hash
+
+
+class SemanticSearch:
+    """Top-k cosine search over the corrected pages, reusing the analysis embeddings.
+
+    build() embeds any new pages into the EmbeddingStore and writes only a
+    JSON-lines list of the corpus files with their content hashes. Queries
+    memory-map the store's own (already L2-normalized) vector file, look up
+    each document's row by hash and score the rows in blocks with one matrix
+    multiply per block, keeping a running top-k, so memory stays flat and a
+    few tens of thousands of pages take milliseconds. For larger corpora an
+    approximate pynndescent index can be built and used instead.
+    """
+
+    def __init__(self, directory="ocr_ai_results", model_name=DEFAULT_MODEL, block_size=65536):
+        self.directory = directory
+        self.model_name = model_name
+        self.block_size = block_size
+        self.store = EmbeddingStore(directory, model_name)
+        slug = re.sub(r'[^A-Za-z0-9.-]+', '_', model_name)
+        self.documents_file = os.path.join(directory, f"search_{slug}_documents.jsonl")
+        self.ann_file = os.path.join(directory, f"search_{slug}_ann.joblib")
+        self.documents = None
+        self.vectors = None
+        # Store row of each document, -1 for pages changed since build()
+        self.rows = None
+        self.ann = None
+        self.chunk_rows = None
+
+    def build(self, ann=False):
+        """Embed any new pages and write the document list (and optionally the ANN index)"""
+        # Imported here so queries don't load the analysis dependencies
+        from analyze_legal_codes import load_legal_texts
+        texts, metadata = load_legal_texts()
+        self.store.add(texts, show_progress_bar=True)
+
+        with open(self.documents_file + ".part", 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'model': self.model_name, 'dim': self.store.dim}) + "\n")
+            for text, entry in zip(texts, metadata):
+                f.write(json.dumps(dict(entry, hash=content_hash(text))) + "\n")
+        os.replace(self.documents_file + ".part", self.documents_file)
+        self.documents = None
+
+        if ann and texts:
+            import joblib
+            from pynndescent import NNDescent
+            self.load()
+            index = NNDescent(np.asarray(self.vectors[self.rows]), metric='cosine', random_state=42)
+            index.prepare()
+            joblib.dump(index, self.ann_file)
+        elif os.path.exists(self.ann_file):
+            os.remove(self.ann_file)
+        return len(texts)
+
+    def load(self):
+        if self.documents is not None:
+            return
+        with open(self.documents_file, 'r', encoding='utf-8') as f:
+            f.readline()  # Header
+            self.documents = [json.loads(line) for line in f]
+        self.vectors = self.store.matrix()
+        self.rows = np.array([self.store.rows.get(document['hash'], -1) for document in self.documents],
+                             dtype=np.int64)
+        stale = int(np.sum(self.rows < 0))
+        if stale:
+            print(f"{stale} pages are no longer in the embedding store and are skipped; run --build again")
+
+    def load_ann(self):
+        if self.ann is None:
+            import joblib
+            self.ann = joblib.load(self.ann_file)
+        return self.ann
+
+    def encode_queries(self, queries):
+        vectors = np.asarray(self.store.load_model().encode(queries, show_progress_bar=False), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+    def top_k(self, query_vectors, k=10, mask=None):
+        """Exact top-k documents for each query vector by blocked matrix multiply; returns (rows, scores).
+
+        Rows index self.documents. Fewer than k are returned when fewer
+        documents pass the mask.
+        """
+        count = len(query_vectors)
+        usable = self.rows >= 0 if mask is None else (self.rows >= 0) & mask
+        k = min(k, int(usable.sum()))
+        best_scores = np.full((count, 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((count, 0), dtype=np.int64)
+        if k <= 0:
+            return best_rows, best_scores
+        for start in range(0, len(self.rows), self.block_size):
+            rows = self.rows[start:start + self.block_size]
+            # Pages are stored in corpus order, so most blocks are a plain slice of the memory map
+            if rows[0] >= 0 and np.array_equal(rows, np.arange(rows[0], rows[0] + len(rows))):
+                block = self.vectors[rows[0]:rows[0] + len(rows)]
+            else:
+                block = self.vectors[np.maximum(rows, 0)]
+            scores = query_vectors @ block.T
+            scores[:, ~usable[start:start + len(rows)]] = -np.inf
+            take = min(k, scores.shape[1])
+            candidates = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, candidates, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, candidates + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def top_k_approximate(self, query_vectors, k=10, mask=None):
+        """Top-k from the pynndescent index; over-fetches when filtering by state"""
+        fetch = min(len(self.documents), k if mask is None else k * 10)
+        if fetch <= 0:
+            return [np.zeros(0, dtype=np.int64) for _ in query_vectors], [np.zeros(0) for _ in query_vectors]
+        rows, distances = self.load_ann().query(query_vectors, k=fetch)
+        scores = 1 - distances
+        results_rows, results_scores = [], []
+        for query_rows, query_scores in zip(rows, scores):
+            if mask is not None:
+                keep = mask[query_rows]
+                query_rows, query_scores = query_rows[keep], query_scores[keep]
+            results_rows.append(query_rows[:k])
+            results_scores.append(query_scores[:k])
+        return results_rows, results_scores
+
+    def load_chunk_rows(self):
+        """Map document hash -> its rows in the chunk store (empty when chunks weren't kept)"""
+        if self.chunk_rows is None:
+            self.chunk_rows = {}
+            for row, entry in enumerate(self.store.chunks.entries):
+                self.chunk_rows.setdefault(entry['hash'], []).append(row)
+        return self.chunk_rows
+
+    def snippet(self, document, query_vector, length=300):
+        """Best-matching passage of a document when chunk vectors are stored, else its opening text"""
+        with open(document['path'], 'r', encoding='utf-8') as f:
+            text = f.read()
+        start, end = 0, length
+        rows = self.load_chunk_rows().get(document['hash'])
+        if rows:
+            scores = self.store.chunks.matrix()[rows] @ query_vector
+            entry = self.store.chunks.entries[rows[int(np.argmax(scores))]]
+            start, end = entry['start'], entry['end']
+        snippet = " ".join(text[start:end].split())
+        return snippet[:length] + ("..." if len(snippet) > length else "")
+
+    def search(self, queries, k=10, state=None, approximate=False):
+        """Search for each query; returns a list of result lists with file, state, path, score and snippet"""
+        self.load()
+        query_vectors = self.encode_queries(queries)
+        mask = None
+        if state:
+            mask = np.array([document['state'] == state.upper() for document in self.documents])
+        if approximate:
+            rows, scores = self.top_k_approximate(query_vectors, k, mask)
+        else:
+            rows, scores = self.top_k(query_vectors, k, mask)
+
+        results = []
+        for query_vector, query_rows, query_scores in zip(query_vectors, rows, scores):
+            hits = []
+            for row, score in zip(query_rows, query_scores):
+                if not np.isfinite(score):
+                    continue
+                document = self.documents[row]
+                hits.append({
+                    'file': document['file'],
+                    'state': document['state'],
+                    'path': document['path'],
+                    'score': round(float(score), 4),
+                    'snippet': self.snippet(document, query_vector)
+                })
+            results.append(hits)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Semantic search over the corrected legal texts")
+    parser.add_argument('query', nargs='*', help="Query text")
+    parser.add_argument('--build', action='store_true', help="Embed new pages and rebuild the search matrix")
+    parser.add_argument('--ann', action='store_true',
+                        help="With --build, also build an approximate index; otherwise query it")
+    parser.add_argument('--batch', metavar='FILE', help="Run one query per line of FILE ('-' for stdin)")
+    parser.add_argument('-k', type=int, default=10, help="Results per query")
+    parser.add_argument('--state', help="Only return pages from this state (AL, NC, TN)")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON lines")
+    args = parser.parse_args()
+
+    search = SemanticSearch()
+    if args.build:
+        count = search.build(ann=args.ann)
+        print(f"Indexed {count} documents")
+        if not args.query and not args.batch:
+            return
+
+    queries = []
+    if args.query:
+        queries.append(" ".join(args.query))
+    if args.batch:
+        source = sys.stdin if args.batch == '-' else open(args.batch, 'r', encoding='utf-8')
+        queries.extend(line.strip() for line in source if line.strip())
+    if not queries:
+        parser.error("no query given")
+
+    start = time.perf_counter()
+    results = search.search(queries, k=args.k, state=args.state, approximate=args.ann)
+    elapsed = time.perf_counter() - start
+
+    for query, hits in zip(queries, results):
+        if args.json:
+            print(json.dumps({'query': query, 'results': hits}))
+            continue
+        print(f"\n{query}")
+        for rank, hit in enumerate(hits, 1):
+            print(f"{rank:>3}. [{hit['state']}] {hit['file']} ({hit['score']:.3f})")
+            print(f"     {hit['snippet']}")
+    if not args.json:
+        print(f"\n{len(queries)} queries in {elapsed * 1000:.1f} ms (including query encoding)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import os
+import json
+import sqlite3
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+
+class StateStore:
+    """Crash-safe resume state for the OCR scripts, kept in SQLite.
+
+    Replaces rewriting the whole of progress.json after every page: each
+    processed page and each stats entry is a single-row insert committed in its
+    own transaction (WAL mode), so the cost per page stays constant and a crash
+    mid-write can't corrupt earlier state. An existing progress.json is
+    imported the first time the store is opened.
+
+    With read_only the database is opened with SQLite's mode=ro and left
+    exactly as it is: no schema setup and no journal mode change.
+    """
+
+    def __init__(self, path, read_only=False):
+        self.path = path
+        if read_only:
+            self.db = sqlite3.connect(f"{Path(path).absolute().as_uri()}?mode=ro", uri=True)
+            return
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS processed_files (path TEXT PRIMARY KEY, processed_at TEXT NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS processing_stats (id INTEGER PRIMARY KEY AUTOINCREMENT, entry TEXT NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.db.commit()
+
+    def get_meta(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def load(self):
+        """Return (processed_files, total_tokens, total_cost, processing_stats)"""
+        processed_files = {row[0] for row in self.db.execute("SELECT path FROM processed_files")}
+        processing_stats = [json.loads(row[0]) for row in self.db.execute("SELECT entry FROM processing_stats ORDER BY id")]
+        return (processed_files,
+                self.get_meta('total_tokens', 0),
+                self.get_meta('total_cost', 0),
+                processing_stats)
+
+    def summary(self):
+        """Counts and totals without loading every stats entry (for `status`)"""
+        return {
+            'processed_files': self.db.execute("SELECT COUNT(*) FROM processed_files").fetchone()[0],
+            'stats_entries': self.db.execute("SELECT COUNT(*) FROM processing_stats").fetchone()[0],
+            'total_tokens': self.get_meta('total_tokens', 0),
+            'total_cost': self.get_meta('total_cost', 0),
+            'last_update': self.get_meta('last_update')
+        }
+
+    def processed_paths(self):
+        return [row[0] for row in self.db.execute("SELECT path FROM processed_files")]
+
+    def add_stats(self, entry, total_tokens, total_cost):
+        """Append one stats entry and the updated running totals"""
+        with self.db:
+            self.db.execute("INSERT INTO processing_stats (entry) VALUES (?)", (json.dumps(entry),))
+            self._set_meta('total_tokens', total_tokens)
+            self._set_meta('total_cost', total_cost)
+            self._set_meta('last_update', datetime.now().isoformat())
+
+    def mark_processed(self, image_path):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO processed_files (path, processed_at) VALUES (?, ?)",
+                            (image_path, datetime.now().isoformat()))
+            self._set_meta('last_update', datetime.now().isoformat())
+
+    def import_progress_json(self, progress_file):
+        """Import a progress.json written by the old whole-file save_progress().
+
+        Returns False without changing anything if this file was already
+        imported, so importing twice doesn't duplicate the stats entries.
+        """
+        if self.get_meta('imported_progress_json') == os.path.abspath(progress_file):
+            return False
+        with open(progress_file, 'r') as f:
+            progress_data = json.load(f)
+        last_update = progress_data.get('last_update') or datetime.now().isoformat()
+
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO processed_files (path, processed_at) VALUES (?, ?)",
+                                [(path, last_update) for path in progress_data.get('processed_files', [])])
+            self.db.executemany("INSERT INTO processing_stats (entry) VALUES (?)",
+                                [(json.dumps(entry),) for entry in progress_data.get('processing_stats', [])])
+            self._set_meta('total_tokens', progress_data.get('total_tokens', 0))
+            self._set_meta('total_cost', progress_data.get('total_cost', 0))
+            self._set_meta('last_update', last_update)
+            self._set_meta('imported_progress_json', os.path.abspath(progress_file))
+        return True
+
+    def export_progress_json(self, progress_file):
+        """Write the state out in the old progress.json format"""
+        processed_files, total_tokens, total_cost, processing_stats = self.load()
+        progress_data = {
+            'processed_files': sorted(processed_files),
+            'total_tokens': total_tokens,
+            'total_cost': total_cost,
+            'processing_stats': processing_stats,
+            'last_update': self.get_meta('last_update')
+        }
+        with open(progress_file, 'w') as f:
+            json.dump(progress_data, f, indent=2)
+
+    def compact(self):
+        """Fold the WAL back into the main database file"""
+        self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        self.compact()
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import/export OCR resume state")
+    parser.add_argument('--db', default=os.path.join("ocr_ai_results", "progress.sqlite"))
+    parser.add_argument('--import-json', metavar='PROGRESS_JSON', help="Import an existing progress.json")
+    parser.add_argument('--export-json', metavar='PROGRESS_JSON', help="Export state as progress.json")
+    args = parser.parse_args()
+
+    store = StateStore(args.db)
+    if args.import_json:
+        if store.import_progress_json(args.import_json):
+            print(f"Imported {args.import_json} into {args.db}")
+        else:
+            print(f"{args.import_json} was already imported into {args.db}; skipped")
+    if args.export_json:
+        store.export_progress_json(args.export_json)
+        print(f"Exported {args.db} to {args.export_json}")
+
+    processed_files, total_tokens, total_cost, processing_stats = store.load()
+    print(f"Processed files: {len(processed_files)}")
+    print(f"Stats entries: {len(processing_stats)}")
+    print(f"Total Tokens Used: {total_tokens:,}")
+    print(f"Total Estimated Cost: ${total_cost:.2f}")
+    store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import os
+import glob
+import json
+from datetime import datetime
+from state_store import StateStore
+
+# Only the standard library and state_store are imported, so `status` starts instantly
+STATES = ['al', 'nc', 'tn']
+OUTPUT_DIR = "ocr_ai_results"
+
+
+def count_files(directory, extensions):
+    if not os.path.isdir(directory):
+        return 0
+    return sum(1 for file in os.listdir(directory) if file.lower().endswith(extensions))
+
+
+def file_info(path):
+    """Size and modification time of a file, or None if it doesn't exist"""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return {'bytes': stat.st_size, 'modified': datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds')}
+
+
+def count_by_state(paths):
+    """Number of page keys (divorce_codes_jpg/<state>_divorce_codes_jpg/...) per state code"""
+    counts = {}
+    for path in paths:
+        state = os.path.basename(os.path.dirname(path)).split('_')[0]
+        counts[state] = counts.get(state, 0) + 1
+    return counts
+
+
+def collect_status(output_dir=OUTPUT_DIR):
+    """Progress of every stage, read from the files each one leaves behind"""
+    progress = None
+    processed_by_state = {}
+    progress_path = os.path.join(output_dir, "progress.sqlite")
+    if os.path.exists(progress_path):
+        store = StateStore(progress_path, read_only=True)
+        progress = store.summary()
+        processed_by_state = count_by_state(store.processed_paths())
+        store.db.close()
+    elif os.path.exists(os.path.join(output_dir, "progress.json")):
+        # Written by older runs and not yet imported (the next OCR run imports it)
+        with open(os.path.join(output_dir, "progress.json"), 'r') as f:
+            progress_data = json.load(f)
+        progress = {
+            'processed_files': len(progress_data.get('processed_files', [])),
+            'stats_entries': len(progress_data.get('processing_stats', [])),
+            'total_tokens': progress_data.get('total_tokens', 0),
+            'total_cost': progress_data.get('total_cost', 0),
+            'last_update': progress_data.get('last_update')
+        }
+        processed_by_state = count_by_state(progress_data.get('processed_files', []))
+
+    states = {}
+    for state in STATES:
+        page_dir = os.path.join("divorce_codes_jpg", f"{state}_divorce_codes_jpg")
+        pages = count_files(page_dir, ('.jpg', '.jpeg', '.txt'))
+        processed = processed_by_state.get(state, 0)
+        states[state.upper()] = {
+            'source_files': count_files(f"{state}_divorce_codes", ('.pdf', '.jpg', '.jpeg')),
+            'pages': pages,
+            'text_layer_pages': count_files(page_dir, ('.txt',)),
+            'processed': processed,
+            'pending': max(0, pages - processed),
+            'corrected_files': count_files(os.path.join(output_dir, f"{state}_results"), ('_corrected.txt',))
+        }
+
+    bundle = None
+    manifest_path = os.path.join("clustering_results", "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        bundle = dict(file_info(manifest_path), documents=manifest['rows'], columns=list(manifest['columns']))
+
+    stores = {os.path.basename(path): file_info(path) for path in sorted(
+        [os.path.join(output_dir, name) for name in ("ocr_cache.sqlite", "correction_cache.sqlite",
+                                                     "keyword_index.sqlite")]
+        + glob.glob(os.path.join(output_dir, "embeddings_*.f32"))
+    ) if os.path.exists(path)}
+
+    return {
+        'states': states,
+        'progress': progress,
+        'stores': stores,
+        'analysis': {
+            'results_bundle': bundle,
+            'visualization': file_info("visualizations.html")
+        }
+    }
+
+
+def print_status(status):
+    print(f"{'state':<6} {'sources':>8} {'pages':>7} {'text layer':>11} {'processed':>10} {'pending':>8} {'corrected':>10}")
+    for state, counts in status['states'].items():
+        print(f"{state:<6} {counts['source_files']:>8} {counts['pages']:>7} {counts['text_layer_pages']:>11} "
+              f"{counts['processed']:>10} {counts['pending']:>8} {counts['corrected_files']:>10}")
+
+    progress = status['progress']
+    if progress:
+        print(f"\nProcessed files: {progress['processed_files']} (last update {progress['last_update']})")
+        print(f"Total Tokens Used: {progress['total_tokens']:,}")
+        print(f"Total Estimated Cost: ${progress['total_cost']:.2f}")
+    else:
+        print("\nNo OCR progress recorded yet")
+
+    if status['stores']:
+        print("\nStores:")
+        for name, info in status['stores'].items():
+            print(f"  {name:<40} {info['bytes'] / 1024 / 1024:>8.1f} MB  {info['modified']}")
+
+    bundle = status['analysis']['results_bundle']
+    if bundle:
+        print(f"\nAnalysis: {bundle['documents']} documents clustered ({bundle['modified']})")
+    else:
+        print("\nAnalysis: not run yet")
+    visualization = status['analysis']['visualization']
+    if visualization:
+        print(f"Visualization: visualizations.html ({visualization['bytes'] / 1024 / 1024:.1f} MB, "
+              f"{visualization['modified']})")
+
+
+def run(args):
+    """The `status` command; args are parsed by legal_codes.cli"""
+    status = collect_status()
+    if args.json:
+        print(json.dumps(status, indent=2))
+    else:
+        print_status(status)
@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import math
+import cProfile
+import pstats
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Page the current task is working on. asyncio tasks copy the context they are
+# created in, so spans recorded deep inside the correction engine still land on
+# the right page without passing it through every call.
+current_page = ContextVar('current_page', default=None)
+
+# Histogram bucket upper bounds, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+METRIC_PREFIX = "ocr_pipeline"
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+class Tracer:
+    """Per-page spans for each processing stage, plus run-level summaries and exports.
+
+    A span is a plain dict: stage, page, start (Unix seconds), duration
+    (seconds) and pid, plus whatever the stage adds - retries, bytes_in,
+    bytes_out, cached, route, error. Stages are dotted names ('ocr.tesseract',
+    'api.request') so they group naturally in the exports.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.spans = []
+
+    @contextmanager
+    def span(self, stage, page=None, **attributes):
+        """Time the body of a with-block; the yielded dict can be filled in as it runs"""
+        span = {'stage': stage, 'page': page if page is not None else current_page.get(),
+                'start': time.time(), 'pid': os.getpid(), **attributes}
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span['error'] = type(e).__name__
+            raise
+        finally:
+            span['duration'] = time.perf_counter() - started
+            self.spans.append(span)
+
+    def add(self, stage, start, end, page=None, **attributes):
+        """Record a span timed elsewhere, e.g. by an OCR worker process"""
+        span = {'stage': stage, 'page': page if page is not None else current_page.get(),
+                'start': start, 'duration': max(0.0, end - start), 'pid': os.getpid(), **attributes}
+        self.spans.append(span)
+        return span
+
+    def by_stage(self):
+        stages = {}
+        for span in self.spans:
+            stages.setdefault(span['stage'], []).append(span)
+        return stages
+
+    def summary(self):
+        """Per stage: span count, total/mean/p50/p95/max seconds, retries and bytes in/out"""
+        summary = {}
+        for stage, spans in sorted(self.by_stage().items()):
+            durations = sorted(span['duration'] for span in spans)
+            summary[stage] = {
+                'count': len(spans),
+                'seconds': sum(durations),
+                'mean': sum(durations) / len(durations),
+                'p50': percentile(durations, 50),
+                'p95': percentile(durations, 95),
+                'max': durations[-1],
+                'retries': sum(span.get('retries', 0) for span in spans),
+                'bytes_in': sum(span.get('bytes_in', 0) for span in spans),
+                'bytes_out': sum(span.get('bytes_out', 0) for span in spans),
+                'errors': sum(1 for span in spans if 'error' in span)
+            }
+        return summary
+
+    def histograms(self, buckets=DURATION_BUCKETS):
+        """Per stage: cumulative span counts for each bucket bound (seconds), plus count and sum"""
+        histograms = {}
+        for stage, spans in sorted(self.by_stage().items()):
+            durations = [span['duration'] for span in spans]
+            histograms[stage] = {
+                'buckets': {str(bound): sum(1 for d in durations if d <= bound) for bound in buckets},
+                'count': len(durations),
+                'sum': sum(durations)
+            }
+        return histograms
+
+    def write_prometheus(self, path, buckets=DURATION_BUCKETS):
+        """Write the run's histograms and counters in the Prometheus text format (e.g. for node_exporter's textfile collector)"""
+        lines = [
+            f"# HELP {METRIC_PREFIX}_stage_duration_seconds Time spent per span in each processing stage",
+            f"# TYPE {METRIC_PREFIX}_stage_duration_seconds histogram",
+        ]
+        for stage, histogram in self.histograms(buckets).items():
+            for bound, count in histogram['buckets'].items():
+                lines.append(f'{METRIC_PREFIX}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{METRIC_PREFIX}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+            lines.append(f'{METRIC_PREFIX}_stage_duration_seconds_sum{{stage="{stage}"}} {histogram["sum"]:.6f}')
+            lines.append(f'{METRIC_PREFIX}_stage_duration_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+
+        summary = self.summary()
+        for name, help_text in [('retries', "Retried API attempts"), ('bytes_in', "Bytes read"),
+                                ('bytes_out', "Bytes written or returned"), ('errors', "Spans that ended in an error")]:
+            lines.append(f"# HELP {METRIC_PREFIX}_stage_{name}_total {help_text} per processing stage")
+            lines.append(f"# TYPE {METRIC_PREFIX}_stage_{name}_total counter")
+            for stage, stats in summary.items():
+                lines.append(f'{METRIC_PREFIX}_stage_{name}_total{{stage="{stage}"}} {stats[name]}')
+
+        lines.append(f"# HELP {METRIC_PREFIX}_run_start_time_seconds Unix time the run started")
+        lines.append(f"# TYPE {METRIC_PREFIX}_run_start_time_seconds gauge")
+        lines.append(f"{METRIC_PREFIX}_run_start_time_seconds {self.started:.3f}")
+        with open(path + ".part", 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(path + ".part", path)
+
+    def write_chrome_trace(self, path):
+        """Write the spans as a Chrome trace-event file (chrome://tracing, Perfetto, speedscope).
+
+        Each process gets a row: the main process shows one lane per page,
+        OCR workers one lane each.
+        """
+        main_pid = os.getpid()
+        lanes = {}
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': main_pid, 'args': {'name': 'main'}}]
+        for span in self.spans:
+            pid = span['pid']
+            if pid == main_pid:
+                if span['page'] not in lanes:
+                    lanes[span['page']] = len(lanes) + 1
+                    events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': lanes[span['page']],
+                                   'args': {'name': span['page'] or 'run'}})
+                tid = lanes[span['page']]
+            else:
+                if pid not in lanes:
+                    lanes[pid] = pid
+                    events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': f"OCR worker {pid}"}})
+                tid = pid
+            args = {key: value for key, value in span.items() if key not in ('stage', 'start', 'duration', 'pid')}
+            events.append({
+                'name': span['stage'],
+                'cat': span['stage'].split('.')[0],
+                'ph': 'X',
+                'ts': round((span['start'] - self.started) * 1e6),
+                'dur': round(span['duration'] * 1e6),
+                'pid': pid,
+                'tid': tid,
+                'args': args
+            })
+        with open(path + ".part", 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        os.replace(path + ".part", path)
+
+
+@contextmanager
+def profiled(path=None, top=25):
+    """cProfile the body of a with-block, saving the stats to path and printing the top functions.
+
+    Does nothing when path is None. Open the saved file with snakeviz or
+    `python -m pstats`.
+    """
+    if path is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"\nProfile saved to {path}; top {top} by cumulative time:")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
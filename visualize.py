@@ -0,0 +1,162 @@
+import os
+import math
+import time
+import numpy as np
+import plotly.graph_objects as go
+import plotly.express as px
+
+# Points drawn in the overview; clusters are shown in full when drilled into
+DEFAULT_MAX_POINTS = 20000
+# Largest clusters that get their own drill-down entry; the rest are grouped
+DEFAULT_DRILL_DOWN_CLUSTERS = 50
+
+
+def density_sample(coordinates, max_points=DEFAULT_MAX_POINTS, grid=200, seed=42):
+    """Indices of at most max_points points, thinned where the plot is dense.
+
+    Points are binned into a grid x grid raster and every cell keeps at most
+    the same number of randomly chosen points, with the cap picked so the total
+    fits max_points. Sparse regions and outliers survive untouched; only
+    crowded cells, where overplotting hides points anyway, are thinned.
+    """
+    count = len(coordinates)
+    if count <= max_points:
+        return np.arange(count)
+
+    low = coordinates.min(axis=0)
+    span = np.maximum(coordinates.max(axis=0) - low, 1e-9)
+    cells_xy = np.minimum(((coordinates - low) / span * grid).astype(np.int64), grid - 1)
+    cells = cells_xy[:, 0] * grid + cells_xy[:, 1]
+
+    # Largest per-cell cap whose total still fits
+    cell_counts = np.bincount(cells)
+    cell_counts = cell_counts[cell_counts > 0]
+    low_cap, high_cap = 1, int(cell_counts.max())
+    while low_cap < high_cap:
+        cap = (low_cap + high_cap + 1) // 2
+        if np.minimum(cell_counts, cap).sum() <= max_points:
+            low_cap = cap
+        else:
+            high_cap = cap - 1
+
+    # Rank points within their cell in random order and keep the first `cap`
+    order = np.random.default_rng(seed).permutation(count)
+    order = order[np.argsort(cells[order], kind='stable')]
+    sorted_cells = cells[order]
+    starts = np.searchsorted(sorted_cells, sorted_cells, side='left')
+    rank = np.arange(count) - starts
+    return np.sort(order[rank < low_cap])
+
+
+def category_codes(values, title=None, label=str, max_ticks=40):
+    """Integer codes for category values plus a matching stepped colorscale and labelled colorbar.
+
+    Numeric colour arrays are written to the HTML as compact typed arrays,
+    unlike one colour string per point. The colorbar has one tick per
+    category (every few categories when there are more than max_ticks), so it
+    doubles as the legend.
+    """
+    categories, codes = np.unique(values, return_inverse=True)
+    palette = px.colors.qualitative.Dark24
+    count = max(len(categories), 1)
+    colorscale = []
+    for i in range(count):
+        colour = palette[i % len(palette)]
+        colorscale += [[i / count, colour], [(i + 1) / count, colour]]
+    ticks = list(range(0, len(categories), math.ceil(count / max_ticks)))
+    colorbar = dict(title=title, tickvals=ticks, ticktext=[label(categories[i]) for i in ticks])
+    return codes.astype(np.int32), dict(colorscale=colorscale, cmin=-0.5, cmax=count - 0.5,
+                                        colorbar=colorbar, showscale=True)
+
+
+def cluster_label(cluster):
+    return "Unclustered" if cluster == -1 else f"Cluster {cluster}"
+
+
+def build_figure(coordinates, clusters, metadata, max_points=DEFAULT_MAX_POINTS,
+                 drill_down_clusters=DEFAULT_DRILL_DOWN_CLUSTERS):
+    """One WebGL figure with cluster/state colouring and a per-cluster drill-down menu.
+
+    Trace 0 is the density-sampled overview. The drill_down_clusters largest
+    clusters each get a hidden trace, and the remaining clusters share one
+    "smaller clusters" trace; every drill-down trace is density-sampled to
+    max_points as well, so the page stays bounded however many clusters there
+    are. Colouring by cluster or state only swaps trace 0's colour array and
+    colorbar labels, so the overview coordinates are stored once.
+    """
+    coordinates = np.asarray(coordinates)
+    clusters = np.asarray(clusters)
+    states = np.array([m['state'] for m in metadata])
+    files = np.array([m['file'] for m in metadata])
+    sample = density_sample(coordinates, max_points)
+
+    cluster_codes, cluster_scale = category_codes(clusters[sample], "Cluster", cluster_label)
+    state_codes, state_scale = category_codes(states[sample], "State")
+    hovertemplate = "%{customdata[0]}<br>State: %{customdata[1]}<br>Cluster: %{customdata[2]}<extra></extra>"
+
+    traces = [go.Scattergl(
+        x=coordinates[sample, 0], y=coordinates[sample, 1], mode='markers',
+        marker=dict(size=5, color=cluster_codes, **cluster_scale),
+        customdata=np.column_stack([files[sample], states[sample], clusters[sample]]),
+        hovertemplate=hovertemplate, name='All documents'
+    )]
+    cluster_ids, cluster_sizes = np.unique(clusters, return_counts=True)
+    by_size = np.argsort(-cluster_sizes, kind='stable')
+    cluster_ids, cluster_sizes = cluster_ids[by_size].tolist(), cluster_sizes[by_size].tolist()
+
+    # (label, member indices) per drill-down entry
+    groups = [(cluster_label(cluster), np.nonzero(clusters == cluster)[0])
+              for cluster in cluster_ids[:drill_down_clusters]]
+    if len(cluster_ids) > drill_down_clusters:
+        rest = cluster_ids[drill_down_clusters:]
+        groups.append((f"{len(rest)} smaller clusters", np.nonzero(np.isin(clusters, rest))[0]))
+
+    for label, members in groups:
+        shown = members[density_sample(coordinates[members], max_points)]
+        member_codes, member_scale = category_codes(states[shown], "State")
+        traces.append(go.Scattergl(
+            x=coordinates[shown, 0], y=coordinates[shown, 1], mode='markers', visible=False,
+            marker=dict(size=6, color=member_codes, **member_scale),
+            customdata=np.column_stack([files[shown], states[shown], clusters[shown]]),
+            hovertemplate=hovertemplate, name=label
+        ))
+
+    title = f"Legal Codes ({len(sample):,} of {len(coordinates):,} documents shown)"
+    drill_down = [dict(label="All clusters", method='update',
+                       args=[{'visible': [True] + [False] * len(groups)}, {'title': title}])]
+    for i, (label, members) in enumerate(groups):
+        visible = [False] * (len(groups) + 1)
+        visible[i + 1] = True
+        shown = len(traces[i + 1].x)
+        documents = f"{len(members):,} documents" if shown == len(members) else f"{shown:,} of {len(members):,} documents"
+        drill_down.append(dict(label=f"{label} ({len(members)})", method='update',
+                               args=[{'visible': visible}, {'title': f"{label}: {documents}, coloured by state"}]))
+
+    colouring = [
+        dict(label="Colour by cluster", method='restyle',
+             args=[{'marker.color': [cluster_codes], 'marker.colorscale': [cluster_scale['colorscale']],
+                    'marker.cmax': cluster_scale['cmax'], 'marker.colorbar': [cluster_scale['colorbar']]}, [0]]),
+        dict(label="Colour by state", method='restyle',
+             args=[{'marker.color': [state_codes], 'marker.colorscale': [state_scale['colorscale']],
+                    'marker.cmax': state_scale['cmax'], 'marker.colorbar': [state_scale['colorbar']]}, [0]]),
+    ]
+
+    figure = go.Figure(traces)
+    figure.update_layout(
+        title=title, xaxis_title='UMAP1', yaxis_title='UMAP2', showlegend=False,
+        updatemenus=[
+            dict(type='buttons', direction='right', buttons=colouring, x=0, y=1.12, xanchor='left'),
+            dict(buttons=drill_down, x=1, y=1.12, xanchor='right'),
+        ]
+    )
+    return figure
+
+
+def write_webgl_visualization(coordinates, clusters, metadata, path="visualizations.html",
+                              max_points=DEFAULT_MAX_POINTS, include_plotlyjs=True,
+                              drill_down_clusters=DEFAULT_DRILL_DOWN_CLUSTERS):
+    """Build and write the WebGL figure; returns (seconds, bytes written)"""
+    start = time.perf_counter()
+    figure = build_figure(coordinates, clusters, metadata, max_points, drill_down_clusters)
+    figure.write_html(path, include_plotlyjs=include_plotlyjs)
+    return time.perf_counter() - start, os.path.getsize(path)